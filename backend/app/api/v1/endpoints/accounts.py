@@ -97,7 +97,8 @@ def process_transaction(
             db,
             account_id=account_id,
             amount=transaction.amount,
-            operation=transaction.operation
+            operation=transaction.operation,
+            account=account
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -141,7 +142,8 @@ def update_account_status(
     account = AccountService.update_status(
         db,
         account_id=account_id,
-        status=status
+        status=status,
+        account=account
     )
     return account
 
@@ -166,6 +168,7 @@ def update_account_limits(
         db,
         account_id=account_id,
         daily_transfer_limit=limits.daily_transfer_limit,
-        withdrawal_limit=limits.withdrawal_limit
+        withdrawal_limit=limits.withdrawal_limit,
+        account=account
     )
     return account
@@ -39,7 +39,7 @@ def get_budget(
 ):
     """Get a specific budget by ID."""
     budget_service = BudgetService(db)
-    return budget_service.get_budget(budget_id, current_user.id)
+    return budget_service.get_budget(budget_id, current_user.id, load_relations=True)
 
 @router.put("/{budget_id}", response_model=Budget)
 def update_budget(
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from typing import List, Optional
 from datetime import datetime
 from sqlalchemy.orm import Session
@@ -47,6 +47,7 @@ def get_portfolio(
 def add_transaction(
     portfolio_id: int,
     transaction_data: TransactionCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -54,7 +55,7 @@ def add_transaction(
     investment_service = InvestmentService(db)
     # Verify portfolio belongs to user
     investment_service.get_portfolio(portfolio_id, current_user.id)
-    return investment_service.add_transaction(portfolio_id, transaction_data)
+    return investment_service.add_transaction(portfolio_id, transaction_data, background_tasks)
 
 @router.post("/portfolios/{portfolio_id}/update-prices")
 def update_prices(
@@ -5,7 +5,7 @@ from datetime import datetime, timedelta
 from app.api.deps import get_db, get_current_admin_user
 from app.services.reporting import ReportingService
 from app.models.user import User
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 import io
 
 router = APIRouter()
@@ -70,6 +70,16 @@ async def export_report(
         end_date = datetime.utcnow()
     
     reporting_service = ReportingService(db)
+    filename = f"{report_type}_{start_date.date()}_{end_date.date()}.csv"
+    
+    # Detailed exports can be large, so rows stream straight from the cursor
+    if report_type == 'transactions_detailed':
+        response = StreamingResponse(
+            reporting_service.stream_detailed_report_csv(start_date, end_date, user_id),
+            media_type="text/csv"
+        )
+        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+        return response
     
     # Generate report data based on type
     if report_type.startswith('transactions'):
@@ -95,8 +105,30 @@ async def export_report(
         io.StringIO(csv_content),
         media_type="text/csv"
     )
-    response.headers["Content-Disposition"] = f"attachment; filename={report_type}_{start_date.date()}_{end_date.date()}.csv"
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    
+    return response
+
+@router.get("/export/parquet")
+async def export_detailed_report_parquet(
+    start_date: datetime = Query(default=None),
+    end_date: datetime = Query(default=None),
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """Export detailed transaction report to Parquet"""
+    if not start_date:
+        start_date = datetime.utcnow() - timedelta(days=30)
+    if not end_date:
+        end_date = datetime.utcnow()
+    
+    reporting_service = ReportingService(db)
+    content = reporting_service.export_detailed_report_parquet(start_date, end_date, user_id)
+    filename = f"transactions_detailed_{start_date.date()}_{end_date.date()}.parquet"
     
+    response = Response(content=content, media_type="application/vnd.apache.parquet")
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
     return response
 
 @router.get("/metrics")
@@ -1,5 +1,5 @@
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from app.core.deps import get_current_active_user, get_db
@@ -8,7 +8,7 @@ from app.services.fraud_detection import FraudDetectionService
 from app.services.notification_service import NotificationService
 from app.models.user import User as UserModel
 from app.models.transaction import TransactionType, TransactionStatus, Transaction
-from app.schemas.transaction import TransactionCreate, TransactionResponse, TransactionStatistics
+from app.schemas.transaction import TransactionCreate, TransactionResponse, TransactionStatistics, dump_transactions
 from decimal import Decimal
 
 router = APIRouter()
@@ -83,7 +83,7 @@ async def read_account_transactions(
         start_date=start_date,
         end_date=end_date
     )
-    return transactions
+    return Response(content=dump_transactions(transactions), media_type="application/json")
 
 @router.get("/statistics/{account_id}", response_model=TransactionStatistics)
 async def get_transaction_statistics(
@@ -95,20 +95,20 @@ async def get_transaction_statistics(
     """
     Get transaction statistics for an account.
     """
-    transaction_service = TransactionService(db)
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    transactions = await transaction_service.get_user_transactions(
+    stats = Transaction.statistics(
+        db,
         user_id=current_user.id,
-        account_id=account_id,
-        start_date=start_date
+        since=start_date,
+        account_id=account_id
     )
     
-    # Calculate statistics
-    total_transactions = len(transactions)
-    total_deposits = sum(t.amount for t in transactions if t.type == TransactionType.DEPOSIT)
-    total_withdrawals = sum(t.amount for t in transactions if t.type == TransactionType.WITHDRAWAL)
-    total_transfers = sum(t.amount for t in transactions if t.type == TransactionType.TRANSFER)
+    no_rows = (0, Decimal("0"))
+    total_transactions = sum(count for count, _ in stats.values())
+    total_deposits = stats.get(TransactionType.DEPOSIT, no_rows)[1]
+    total_withdrawals = stats.get(TransactionType.WITHDRAWAL, no_rows)[1]
+    total_transfers = stats.get(TransactionType.TRANSFER, no_rows)[1]
     
     return {
         "total_transactions": total_transactions,
@@ -14,6 +14,7 @@ class Settings(BaseSettings):
     
     # Security
     SECRET_KEY: str = secrets.token_urlsafe(32)
+    REFRESH_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     ALGORITHM: str = "HS256"
@@ -57,6 +58,7 @@ class Settings(BaseSettings):
     ENCRYPTION_ALGORITHM: str = "AES-256-GCM"
     RSA_KEY_SIZE: int = 2048
     HASH_ITERATIONS: int = 100000
+    FILE_CRYPTO_BUFFER_SIZE: int = 4 * 1024 * 1024  # bytes per AES-GCM update when (de)crypting files
     
     # SMS Settings (Twilio)
     TWILIO_ACCOUNT_SID: Optional[str] = None
@@ -1,10 +1,17 @@
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, List, Union
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# New hashes use bcrypt over a SHA-256 prehash so passwords longer than
+# bcrypt's 72-byte limit are not silently truncated; plain bcrypt hashes
+# from before the switch still verify.
+pwd_context = CryptContext(
+    schemes=["bcrypt_sha256", "bcrypt"],
+    deprecated="auto",
+    bcrypt_sha256__rounds=12
+)
 
 def create_access_token(
     subject: Union[str, Any], expires_delta: timedelta = None
@@ -82,26 +89,77 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 import base64
 import os
 import json
+import secrets
+
+# Sensitive data is sealed as version (1) | nonce (12) | ciphertext | tag (16);
+# anything else is a base64url Fernet token from before the switch and still decrypts.
+# Version 0x01 carries a JSON document, 0x02 raw bytes.
+_SEALED_VERSION = b"\x01"
+_RAW_SEALED_VERSION = b"\x02"
+_GCM_NONCE_SIZE = 12
+_SEALED_KEY_INFO = b"banking-system/sensitive-data-aes256gcm"
 
 class EncryptionUtils:
     def __init__(self):
         self.master_key = base64.b64decode(settings.ENCRYPTION_MASTER_KEY)
         self.fernet = Fernet(self.master_key)
+        # AES-256-GCM through OpenSSL EVP (AES-NI where available), key schedule built once
+        self.aesgcm = AESGCM(HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=_SEALED_KEY_INFO
+        ).derive(base64.urlsafe_b64decode(self.master_key)))
     
     def encrypt_sensitive_data(self, data: dict) -> str:
-        """Encrypt sensitive data using Fernet (symmetric encryption)."""
+        """Encrypt sensitive data using AES-256-GCM (symmetric encryption)."""
         json_data = json.dumps(data)
-        encrypted_data = self.fernet.encrypt(json_data.encode())
+        nonce = os.urandom(_GCM_NONCE_SIZE)
+        encrypted_data = _SEALED_VERSION + nonce + self.aesgcm.encrypt(nonce, json_data.encode(), None)
         return base64.b64encode(encrypted_data).decode()
 
+    def encrypt_bytes(self, data: bytes) -> bytes:
+        """Encrypt raw bytes with AES-256-GCM, returning the sealed blob unencoded."""
+        return self.encrypt_many([data])[0]
+
+    def encrypt_many(self, items: List[bytes]) -> List[bytes]:
+        """Encrypt a batch like encrypt_bytes, drawing all nonces in one read."""
+        nonces = os.urandom(_GCM_NONCE_SIZE * len(items))
+        sealed = []
+        for offset, data in zip(range(0, len(nonces), _GCM_NONCE_SIZE), items):
+            nonce = nonces[offset:offset + _GCM_NONCE_SIZE]
+            sealed.append(_RAW_SEALED_VERSION + nonce + self.aesgcm.encrypt(nonce, data, None))
+        return sealed
+
+    def is_raw_sealed(self, blob: bytes) -> bool:
+        """Whether a blob came from encrypt_bytes rather than encrypt_sensitive_data."""
+        return blob[:1] == _RAW_SEALED_VERSION
+
+    def decrypt_bytes(self, blob: bytes) -> bytes:
+        """Decrypt a blob produced by encrypt_bytes."""
+        try:
+            if not self.is_raw_sealed(blob):
+                raise ValueError("not a raw sealed blob")
+            nonce = blob[1:1 + _GCM_NONCE_SIZE]
+            return self.aesgcm.decrypt(nonce, blob[1 + _GCM_NONCE_SIZE:], None)
+        except Exception as e:
+            raise ValueError(f"Failed to decrypt data: {str(e)}")
+
     def decrypt_sensitive_data(self, encrypted_data: str) -> dict:
-        """Decrypt sensitive data using Fernet."""
+        """Decrypt sensitive data sealed with AES-256-GCM or legacy Fernet."""
         try:
             decoded_data = base64.b64decode(encrypted_data)
-            decrypted_data = self.fernet.decrypt(decoded_data)
+            if decoded_data[:1] == _SEALED_VERSION:
+                nonce = decoded_data[1:1 + _GCM_NONCE_SIZE]
+                decrypted_data = self.aesgcm.decrypt(nonce, decoded_data[1 + _GCM_NONCE_SIZE:], None)
+            else:
+                # Legacy values were b64encode(fernet token), so one decode leaves the token text
+                decrypted_data = self.fernet.decrypt(decoded_data)
             return json.loads(decrypted_data.decode())
         except Exception as e:
             raise ValueError(f"Failed to decrypt data: {str(e)}")
@@ -190,7 +248,8 @@ class EncryptionUtils:
     @staticmethod
     def secure_random_string(length: int = 32) -> str:
         """Generate a secure random string."""
-        return base64.b64encode(os.urandom(length)).decode()[:length]
+        # Draw only the bytes needed for `length` URL-safe base64 characters
+        return secrets.token_urlsafe((length * 3 + 3) // 4)[:length]
 
 # Initialize encryption utils
 encryption_utils = EncryptionUtils()
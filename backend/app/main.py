@@ -4,6 +4,7 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.openapi.utils import get_openapi
 from app.core.middleware import APIMiddleware
+from app.services.notification_service import NotificationService
 from prometheus_client import make_asgi_app
 
 app = FastAPI(
@@ -51,6 +52,10 @@ async def validation_exception_handler(request, exc):
         content={"detail": exc.errors(), "body": exc.body},
     )
 
+@app.on_event("shutdown")
+async def close_notification_clients():
+    await NotificationService.aclose()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, Enum, Numeric, ForeignKey, JSON, Integer
+from sqlalchemy import Column, String, Enum, Numeric, ForeignKey, Integer, text
 from sqlalchemy.orm import relationship
-from .base import TimestampedBase
+from sqlalchemy.dialects.postgresql import JSONB
+from .base import TimestampedBase, MinorUnits
 import enum
 
 class AccountType(enum.Enum):
@@ -25,25 +26,33 @@ class Account(TimestampedBase):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     type = Column(Enum(AccountType), nullable=False)
     status = Column(Enum(AccountStatus), default=AccountStatus.ACTIVE)
-    balance = Column(Numeric(precision=18, scale=2), default=0)
+    balance = Column(MinorUnits, default=0)
     currency = Column(String, default="USD")
     
     # Account features and limits
-    daily_transfer_limit = Column(Numeric(precision=18, scale=2))
-    withdrawal_limit = Column(Numeric(precision=18, scale=2))
-    interest_rate = Column(Numeric(precision=5, scale=2))
+    # Server defaults are in cents for MinorUnits columns
+    daily_transfer_limit = Column(MinorUnits, server_default=text("1000000"))
+    withdrawal_limit = Column(MinorUnits, server_default=text("500000"))
+    interest_rate = Column(Numeric(precision=5, scale=2), server_default=text("0.01"))
     
     # Additional features
-    features = Column(JSON, default={})
-    metadata = Column(JSON, default={})
+    features = Column(
+        JSONB,
+        server_default=text("""'{"debit_card": true, "online_banking": true, "mobile_banking": true}'::jsonb""")
+    )
+    metadata = Column(
+        JSONB,
+        server_default=text("""'{"created_through": "api", "risk_assessment": "low"}'::jsonb""")
+    )
     
     # Risk and compliance
     risk_level = Column(String, default="low")
-    last_activity = Column(JSON, nullable=True)
+    last_activity = Column(JSONB, nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="accounts")
     transactions = relationship("Transaction", back_populates="account")
     
     def __repr__(self):
-        return f"<Account {self.account_number}>"
+        # Read from __dict__ so an expired instance never triggers a refresh
+        return f"<Account {self.__dict__.get('account_number', 'unloaded')}>"
@@ -1,6 +1,7 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB
 from app.models.base import Base
 from app.models.user import User
 
@@ -16,7 +17,7 @@ class AuthDevice(Base):
     is_trusted = Column(Boolean, default=False)
     last_used = Column(DateTime, default=datetime.utcnow)
     risk_score = Column(Integer, default=0)
-    metadata = Column(JSON)
+    metadata = Column(JSONB)
 
     user = relationship("User", back_populates="auth_devices")
 
@@ -30,7 +31,7 @@ class MFAMethod(Base):
     is_primary = Column(Boolean, default=False)
     is_enabled = Column(Boolean, default=True)
     last_used = Column(DateTime)
-    metadata = Column(JSON)
+    metadata = Column(JSONB)
 
     user = relationship("User", back_populates="mfa_methods")
 
@@ -79,6 +80,6 @@ class ConsentRecord(Base):
     ip_address = Column(String)
     user_agent = Column(String)
     is_active = Column(Boolean, default=True)
-    metadata = Column(JSON)
+    metadata = Column(JSONB)
 
     user = relationship("User", back_populates="consent_records")
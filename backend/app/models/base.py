@@ -1,6 +1,8 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, DateTime, func
+from sqlalchemy import Column, Integer, BigInteger, DateTime, SmallInteger, CheckConstraint, func
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_EVEN
 
 Base = declarative_base()
 
@@ -16,3 +18,54 @@ class TimestampedBase(Base):
         onupdate=datetime.utcnow,
         nullable=False
     )
+
+class SmallIntEnum(TypeDecorator):
+    """Stores a Python enum as its 1-based declaration position in a SMALLINT column.
+
+    Members must only ever be appended to the enum, never reordered or removed,
+    since the position is what is persisted.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enum_class = enum_class
+        self._members = list(enum_class)
+        self._codes = {member: code for code, member in enumerate(self._members, start=1)}
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, self.enum_class):
+            value = self.enum_class(value)
+        return self._codes[value]
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self._members[value - 1]
+
+class MinorUnits(TypeDecorator):
+    """Stores a two-decimal money amount as integer minor units (cents) in a BIGINT column.
+
+    Python code keeps working with Decimal; the database compares and adds
+    native integers. Values are rounded half-even to the cent on the way in.
+    """
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return int((Decimal(value) * 100).quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return Decimal(value).scaleb(-2)
+
+def enum_check(column: str, enum_class) -> CheckConstraint:
+    """CHECK constraint limiting a SmallIntEnum column to its valid codes"""
+    codes = ", ".join(str(code) for code in range(1, len(enum_class) + 1))
+    return CheckConstraint(f"{column} IN ({codes})", name=f"ck_{column}_{enum_class.__name__.lower()}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -34,11 +34,15 @@ class Budget(Base):
     period = Column(Enum(BudgetPeriod), nullable=False)
     start_date = Column(DateTime, nullable=False)
     end_date = Column(DateTime, nullable=True)
+    # Running sum of expenses, kept in step by BudgetService.add_expense
+    total_spent = Column(Float, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     user = relationship("User", back_populates="budgets")
+    # Lazy by default: totals come from total_spent, so only queries that return the
+    # collections to the client ask for them with selectinload()
     expenses = relationship("BudgetExpense", back_populates="budget")
     alerts = relationship("BudgetAlert", back_populates="budget")
 
@@ -83,5 +87,15 @@ class BudgetAlert(Base):
     # Relationships
     budget = relationship("Budget", back_populates="alerts")
 
+# Expense sums per budget and date window read amount straight from the index
+Index(
+    "ix_budget_expense_budget_date_amount",
+    BudgetExpense.budget_id,
+    BudgetExpense.date,
+    postgresql_include=["amount"]
+)
+# Active-alert dedup probe on add_expense
+Index("ix_alert_budget_type_status", BudgetAlert.budget_id, BudgetAlert.type, BudgetAlert.status)
+
 # Update User model to include budget relationship
 User.budgets = relationship("Budget", back_populates="user")
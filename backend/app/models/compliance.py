@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, JSON, Enum, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, Float
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB
 from .base import TimestampedBase
 import enum
 
@@ -23,7 +24,7 @@ class ComplianceCheck(TimestampedBase):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     check_type = Column(String, nullable=False)  # KYC, AML, CTF, etc.
     status = Column(Enum(ComplianceStatus), default=ComplianceStatus.PENDING)
-    details = Column(JSON, nullable=True)
+    details = Column(JSONB, nullable=True)
     notes = Column(String, nullable=True)
     
     # Relationships
@@ -34,7 +35,7 @@ class ComplianceReport(TimestampedBase):
 
     transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=True)
     report_type = Column(String, nullable=False)
-    details = Column(JSON, nullable=False)
+    details = Column(JSONB, nullable=False)
     submitted = Column(Boolean, default=False)
     
     # Relationships
@@ -47,7 +48,7 @@ class RegulatoryRequirement(TimestampedBase):
     description = Column(String, nullable=False)
     category = Column(String, nullable=False)  # AML, KYC, etc.
     jurisdiction = Column(String, nullable=False)
-    requirements = Column(JSON, nullable=False)
+    requirements = Column(JSONB, nullable=False)
     active = Column(Boolean, default=True)
 
 class RiskAssessment(TimestampedBase):
@@ -55,7 +56,7 @@ class RiskAssessment(TimestampedBase):
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     risk_level = Column(Enum(RiskLevel), default=RiskLevel.LOW)
-    factors = Column(JSON, nullable=False)
+    factors = Column(JSONB, nullable=False)
     score = Column(Float, nullable=False)
     next_review_date = Column(DateTime, nullable=False)
     
@@ -68,8 +69,8 @@ class SustainabilityMetric(TimestampedBase):
     account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False)
     carbon_footprint = Column(Float, default=0.0)
     sustainability_score = Column(Float, default=0.0)
-    metrics = Column(JSON, nullable=False)
-    recommendations = Column(JSON, nullable=True)
+    metrics = Column(JSONB, nullable=False)
+    recommendations = Column(JSONB, nullable=True)
     
     # Relationships
     account = relationship("Account", back_populates="sustainability_metrics")
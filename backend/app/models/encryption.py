@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -10,7 +10,7 @@ class EncryptionKey(Base):
     id = Column(Integer, primary_key=True, index=True)
     key_id = Column(String, unique=True, index=True)
     key_type = Column(String)  # symmetric, asymmetric_public, asymmetric_private
-    key_data = Column(String)  # Encrypted key data
+    key_data = Column(LargeBinary)  # Encrypted key data, sealed bytes
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime)
     is_active = Column(Boolean, default=True)
@@ -40,3 +40,20 @@ class KeyRotationHistory(Base):
     # Relationships
     key = relationship("EncryptionKey")
     user = relationship("User")
+
+# Rotation scans filter active keys by last rotation, falling back to creation time
+Index(
+    "ix_encryption_keys_rotation_due",
+    EncryptionKey.is_active,
+    EncryptionKey.last_rotated_at,
+    EncryptionKey.created_at
+)
+
+# get_active_key looks up the live key for a purpose/type; only active keys are indexed
+Index(
+    "ix_encryption_keys_active_lookup",
+    EncryptionKey.purpose,
+    EncryptionKey.key_type,
+    EncryptionKey.expires_at,
+    postgresql_where=EncryptionKey.is_active
+)
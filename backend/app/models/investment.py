@@ -1,8 +1,10 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Numeric, ForeignKey, DateTime, Enum, Index, update, values, column
+from sqlalchemy.orm import relationship, Session
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
+from typing import List, Tuple
 import enum
-from app.models.base import Base
+from app.models.base import TimestampedBase, SmallIntEnum, enum_check
 from app.models.user import User
 
 class AssetType(str, enum.Enum):
@@ -23,35 +25,35 @@ class TransactionType(str, enum.Enum):
     DEPOSIT = "deposit"
     WITHDRAWAL = "withdrawal"
 
-class Portfolio(Base):
+class Portfolio(TimestampedBase):
     __tablename__ = "portfolios"
 
-    id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Net deposits less withdrawals, kept in step by InvestmentService.add_transaction
+    # (existing rows are filled by InvestmentService.reconcile_cost_basis)
+    cost_basis = Column(Numeric(precision=18, scale=2), nullable=False, default=0, server_default="0")
 
     # Relationships
     user = relationship("User", back_populates="portfolios")
     holdings = relationship("Holding", back_populates="portfolio")
     transactions = relationship("InvestmentTransaction", back_populates="portfolio")
 
-class Holding(Base):
+class Holding(TimestampedBase):
     __tablename__ = "holdings"
+    __table_args__ = (
+        enum_check("asset_type", AssetType),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
-    asset_type = Column(Enum(AssetType), nullable=False)
+    asset_type = Column(SmallIntEnum(AssetType), nullable=False)
     symbol = Column(String, nullable=False)
     quantity = Column(Float, nullable=False)
     average_price = Column(Float, nullable=False)
     current_price = Column(Float, nullable=True)
     last_updated = Column(DateTime, nullable=True)
-    metadata = Column(JSON, nullable=True)  # Store additional asset-specific data
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    metadata = Column(JSONB, nullable=True)  # Store additional asset-specific data
 
     # Relationships
     portfolio = relationship("Portfolio", back_populates="holdings")
@@ -73,10 +75,32 @@ class Holding(Base):
             return 0
         return ((self.current_price - self.average_price) / self.average_price) * 100
 
-class InvestmentTransaction(Base):
+    @classmethod
+    def bulk_update_prices(
+        cls,
+        session: Session,
+        updates: List[Tuple[int, float, datetime]],
+        batch_size: int = 1000
+    ) -> None:
+        """Apply (holding_id, price, timestamp) updates with one UPDATE ... FROM (VALUES ...) per batch"""
+        for start in range(0, len(updates), batch_size):
+            prices = values(
+                column("id", Integer),
+                column("price", Float),
+                column("ts", DateTime),
+                name="prices"
+            ).data(updates[start:start + batch_size])
+
+            session.execute(
+                update(cls)
+                .where(cls.id == prices.c.id)
+                .values(current_price=prices.c.price, last_updated=prices.c.ts)
+                .execution_options(synchronize_session=False)
+            )
+
+class InvestmentTransaction(TimestampedBase):
     __tablename__ = "investment_transactions"
 
-    id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
     holding_id = Column(Integer, ForeignKey("holdings.id"), nullable=True)
     transaction_type = Column(Enum(TransactionType), nullable=False)
@@ -87,16 +111,14 @@ class InvestmentTransaction(Base):
     fees = Column(Float, default=0)
     date = Column(DateTime, nullable=False)
     notes = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
     portfolio = relationship("Portfolio", back_populates="transactions")
     holding = relationship("Holding", back_populates="transactions")
 
-class PortfolioAlert(Base):
+class PortfolioAlert(TimestampedBase):
     __tablename__ = "portfolio_alerts"
 
-    id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
     holding_id = Column(Integer, ForeignKey("holdings.id"), nullable=True)
     alert_type = Column(String, nullable=False)  # price_target, price_change, portfolio_change
@@ -104,27 +126,33 @@ class PortfolioAlert(Base):
     message = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     triggered_at = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     portfolio = relationship("Portfolio", back_populates="alerts")
     holding = relationship("Holding", back_populates="alerts")
 
-class PortfolioPerformance(Base):
+class PortfolioPerformance(TimestampedBase):
     __tablename__ = "portfolio_performance"
 
-    id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
     date = Column(DateTime, nullable=False)
     total_value = Column(Float, nullable=False)
     daily_return = Column(Float, nullable=True)
     total_return = Column(Float, nullable=True)
     cash_flow = Column(Float, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
     portfolio = relationship("Portfolio", back_populates="performance_history")
 
+# Holding lookup by symbol when recording a trade
+Index("ix_holding_portfolio_symbol", Holding.portfolio_id, Holding.symbol)
+# One performance row per portfolio per day; also serves previous-day lookups and the upsert target
+Index(
+    "uq_portfolio_performance_portfolio_date",
+    PortfolioPerformance.portfolio_id,
+    PortfolioPerformance.date,
+    unique=True
+)
+
 # Update User model to include portfolio relationship
 User.portfolios = relationship("Portfolio", back_populates="user")
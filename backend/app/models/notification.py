@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, JSON, Boolean, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
-from .base import TimestampedBase
+from sqlalchemy.dialects.postgresql import JSONB
+from .base import TimestampedBase, SmallIntEnum, enum_check
 import enum
 
-class NotificationType(str, Enum):
+class NotificationType(str, enum.Enum):
     TRANSACTION = "transaction"
     SECURITY = "security"
     ACCOUNT = "account"
@@ -14,13 +15,13 @@ class NotificationType(str, Enum):
     SYSTEM = "system"
     MARKETING = "marketing"
 
-class NotificationPriority(str, Enum):
+class NotificationPriority(str, enum.Enum):
     LOW = "low"
     MEDIUM = "medium"
     HIGH = "high"
     URGENT = "urgent"
 
-class NotificationChannel(str, Enum):
+class NotificationChannel(str, enum.Enum):
     EMAIL = "email"
     SMS = "sms"
     PUSH = "push"
@@ -29,11 +30,15 @@ class NotificationChannel(str, Enum):
 
 class Notification(TimestampedBase):
     __tablename__ = "notifications"
+    __table_args__ = (
+        enum_check("type", NotificationType),
+        enum_check("priority", NotificationPriority),
+    )
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    type = Column(Enum(NotificationType), nullable=False)
-    priority = Column(Enum(NotificationPriority), default=NotificationPriority.LOW)
-    content = Column(JSON, nullable=False)
+    type = Column(SmallIntEnum(NotificationType), nullable=False)
+    priority = Column(SmallIntEnum(NotificationPriority), default=NotificationPriority.LOW)
+    content = Column(JSONB, nullable=False)
     read = Column(Boolean, default=False)
     
     # Optional fields for tracking delivery status
@@ -42,10 +47,17 @@ class Notification(TimestampedBase):
     push_sent = Column(Boolean, default=False)
     
     # Error tracking
-    delivery_errors = Column(JSON, nullable=True)
+    delivery_errors = Column(JSONB, nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="notifications")
     
     def __repr__(self):
-        return f"<Notification {self.id}: {self.type.value} - {self.priority.value}>"
+        # Read from __dict__ so an expired instance never triggers a refresh
+        state = self.__dict__
+        notification_type = state["type"].value if state.get("type") else "unloaded"
+        priority = state["priority"].value if state.get("priority") else "unloaded"
+        return f"<Notification {state.get('id', 'unloaded')}: {notification_type} - {priority}>"
+
+# Notifications are looked up by the transaction they were raised for
+Index("ix_notifications_content_transaction_id", Notification.content["transaction_id"].astext)
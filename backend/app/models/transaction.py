@@ -1,6 +1,10 @@
-from sqlalchemy import Column, String, Enum, Numeric, ForeignKey, JSON, Integer, DateTime
-from sqlalchemy.orm import relationship
-from .base import TimestampedBase
+from sqlalchemy import Column, String, Numeric, ForeignKey, Integer, BigInteger, DateTime, Index, Computed, func
+from sqlalchemy.orm import relationship, Session
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+from .base import TimestampedBase, SmallIntEnum, enum_check
 import enum
 
 class TransactionType(enum.Enum):
@@ -23,18 +27,25 @@ class TransactionStatus(enum.Enum):
 
 class Transaction(TimestampedBase):
     __tablename__ = "transactions"
+    __table_args__ = (
+        enum_check("type", TransactionType),
+        enum_check("status", TransactionStatus),
+    )
 
     reference_id = Column(String, unique=True, index=True, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False)
-    type = Column(Enum(TransactionType), nullable=False)
-    status = Column(Enum(TransactionStatus), default=TransactionStatus.PENDING)
+    type = Column(SmallIntEnum(TransactionType), nullable=False)
+    status = Column(SmallIntEnum(TransactionStatus), default=TransactionStatus.PENDING)
     amount = Column(Numeric(precision=18, scale=2), nullable=False)
+    # Amount in cents, maintained by the database; reporting aggregates sum this
+    # instead of NUMERIC. Settlement paths keep using `amount`.
+    amount_minor = Column(BigInteger, Computed("(amount * 100)::bigint", persisted=True))
     currency = Column(String, default="USD")
     
     # Transaction details
     description = Column(String)
-    merchant_info = Column(JSON, nullable=True)
+    merchant_info = Column(JSONB, nullable=True)
     category = Column(String)
     
     # For transfers
@@ -43,18 +54,84 @@ class Transaction(TimestampedBase):
     
     # Security and compliance
     ip_address = Column(String, nullable=True)
-    device_info = Column(JSON, nullable=True)
-    location_info = Column(JSON, nullable=True)
+    device_info = Column(JSONB, nullable=True)
+    location_info = Column(JSONB, nullable=True)
     risk_score = Column(Integer, default=0)
     
     # Processing details
     processed_at = Column(DateTime, nullable=True)
     failure_reason = Column(String, nullable=True)
-    metadata = Column(JSON, default={})
+    metadata = Column(JSONB, default={})
     
     # Relationships
     user = relationship("User", back_populates="transactions")
     account = relationship("Account", back_populates="transactions")
     
     def __repr__(self):
-        return f"<Transaction {self.reference_id}>"
+        # Read from __dict__ so an expired instance never triggers a refresh
+        return f"<Transaction {self.__dict__.get('reference_id', 'unloaded')}>"
+
+    @classmethod
+    def statistics(
+        cls,
+        session: Session,
+        user_id: int,
+        since: datetime,
+        until: Optional[datetime] = None,
+        account_id: Optional[int] = None
+    ) -> Dict[TransactionType, Tuple[int, Decimal]]:
+        """Count and sum a user's transactions per type in a single grouped query"""
+        query = session.query(
+            cls.type,
+            func.count(cls.id),
+            func.coalesce(func.sum(cls.amount), 0)
+        ).filter(
+            cls.user_id == user_id,
+            cls.created_at >= since
+        )
+
+        if until:
+            query = query.filter(cls.created_at <= until)
+        if account_id:
+            query = query.filter(cls.account_id == account_id)
+
+        return {
+            transaction_type: (count, total)
+            for transaction_type, count, total in query.group_by(cls.type).all()
+        }
+
+# Per-user history scans filtered by time window
+Index("ix_transactions_user_id_created_at", Transaction.user_id, Transaction.created_at)
+# Per-user scans restricted to one transaction type (debits, credits) over a window
+Index("ix_transactions_user_id_type_created_at", Transaction.user_id, Transaction.type, Transaction.created_at)
+# Per-account daily transfer totals; amount is carried so the sum is an index-only scan
+Index(
+    "ix_transactions_account_id_type_created_at",
+    Transaction.account_id,
+    Transaction.type,
+    Transaction.created_at,
+    postgresql_include=["amount"]
+)
+# Reporting windows (optionally per user) grouped by type/status/hour; covers the
+# summary and metrics aggregates so they run as index-only scans
+Index(
+    "ix_transactions_created_at_report",
+    Transaction.created_at,
+    postgresql_include=["user_id", "type", "status", "amount_minor"]
+)
+# Per-account statistics over a window: type/status breakdown, sums and risk count
+Index(
+    "ix_transactions_account_id_created_at",
+    Transaction.account_id,
+    Transaction.created_at,
+    postgresql_include=["type", "status", "amount", "risk_score"]
+)
+
+# Merchant lookups by id hit an expression index; containment filters use GIN
+Index("ix_transactions_merchant_id", Transaction.merchant_info["merchant_id"].astext)
+Index(
+    "ix_transactions_merchant_info",
+    Transaction.merchant_info,
+    postgresql_using="gin",
+    postgresql_ops={"merchant_info": "jsonb_path_ops"}
+)
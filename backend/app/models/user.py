@@ -1,5 +1,6 @@
-from sqlalchemy import Boolean, Column, String, Enum, JSON, Integer, DateTime
+from sqlalchemy import Boolean, Column, String, Enum, Integer, DateTime, Index
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB
 from .base import TimestampedBase
 import enum
 from datetime import datetime
@@ -26,19 +27,19 @@ class User(TimestampedBase):
     last_login = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    preferences = Column(JSON, default={})
+    preferences = Column(JSONB, default={})
     risk_profile = Column(String)
     kyc_status = Column(String)
-    metadata = Column(JSON)
+    metadata = Column(JSONB)
     
     # Security and authentication
     two_factor_enabled = Column(Boolean, default=False)
     two_factor_secret = Column(String, nullable=True)
-    biometric_data = Column(JSON, nullable=True)
-    security_questions = Column(JSON, nullable=True)
+    biometric_data = Column(JSONB, nullable=True)
+    security_questions = Column(JSONB, nullable=True)
     
     # User preferences and settings
-    notification_settings = Column(JSON, default={})
+    notification_settings = Column(JSONB, default={})
     
     # Risk and compliance
     risk_score = Column(Integer, default=0)
@@ -55,5 +56,19 @@ class User(TimestampedBase):
     social_accounts = relationship("SocialAccount", back_populates="user")
     consent_records = relationship("ConsentRecord", back_populates="user")
     
+    @property
+    def active_channels(self) -> tuple:
+        """Notification channels enabled in notification_settings."""
+        settings = self.notification_settings or {}
+        return tuple(
+            channel
+            for channel, enabled_by_default in (("email", True), ("sms", False), ("push", False))
+            if settings.get(channel, enabled_by_default)
+        )
+    
     def __repr__(self):
-        return f"<User {self.email}>"
+        # Read from __dict__ so an expired instance never triggers a refresh
+        return f"<User {self.__dict__.get('email', 'unloaded')}>"
+
+# Activity reports filter users by login window
+Index("ix_users_last_login", User.last_login)
@@ -1,5 +1,5 @@
-from typing import Optional, Dict
-from pydantic import BaseModel, condecimal
+from typing import Optional, Dict, List, Any
+from pydantic import BaseModel, TypeAdapter, condecimal
 from datetime import datetime
 from app.models.transaction import TransactionType, TransactionStatus
 
@@ -28,6 +28,15 @@ class TransactionResponse(TransactionBase):
     class Config:
         orm_mode = True
 
+# Built once at import; list endpoints encode straight to JSON bytes through it
+TXN_LIST_ADAPTER = TypeAdapter(List[TransactionResponse])
+
+def dump_transactions(rows: List[Any]) -> bytes:
+    """Serialize ORM transactions to a JSON array without an intermediate dict pass"""
+    return TXN_LIST_ADAPTER.dump_json(
+        TXN_LIST_ADAPTER.validate_python(rows, from_attributes=True)
+    )
+
 class TransactionStatistics(BaseModel):
     total_transactions: int
     total_deposits: condecimal(max_digits=18, decimal_places=2)
@@ -1,6 +1,9 @@
 from typing import Optional, Dict
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, ConfigDict, EmailStr, field_validator
 from datetime import datetime
+import re
+
+_DIGIT_RE = re.compile(r'\d')
 
 class UserBase(BaseModel):
     email: Optional[EmailStr] = None
@@ -13,13 +16,15 @@ class UserCreate(UserBase):
     password: str
     full_name: str
     
-    @validator('password')
+    @field_validator('password')
+    @classmethod
     def password_strength(cls, v):
         if len(v) < 8:
             raise ValueError('Password must be at least 8 characters long')
-        if not any(char.isdigit() for char in v):
+        if not _DIGIT_RE.search(v):
             raise ValueError('Password must contain at least one number')
-        if not any(char.isupper() for char in v):
+        # Lowercasing only changes the string if it has an uppercase letter
+        if v.lower() == v:
             raise ValueError('Password must contain at least one uppercase letter')
         return v
 
@@ -38,8 +43,7 @@ class UserInDBBase(UserBase):
     risk_score: Optional[int] = None
     kyc_status: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class User(UserInDBBase):
     pass
@@ -1,16 +1,43 @@
-from typing import Optional, List
+from typing import Dict, Iterable, Iterator, Optional, List
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from fastapi.encoders import jsonable_encoder
 from app.models.account import Account, AccountType, AccountStatus
 from app.models.user import User
-import uuid
+import secrets
 from decimal import Decimal
 
+ACCOUNT_NUMBER_ATTEMPTS = 3
+
 class AccountService:
+    @staticmethod
+    def _finish(db: Session, account: Account, commit: bool) -> None:
+        """
+        Commit and refresh, or only flush when the caller owns the transaction.
+        Transfers pass commit=False for both legs and call db.commit() once.
+        """
+        if commit:
+            db.commit()
+            db.refresh(account)
+        else:
+            db.flush()
+
     @staticmethod
     def get(db: Session, account_id: int) -> Optional[Account]:
         return db.query(Account).filter(Account.id == account_id).first()
 
+    @staticmethod
+    def get_many(db: Session, account_ids: Iterable[int]) -> Dict[int, Account]:
+        """Load several accounts with a single IN query, keyed by id."""
+        account_ids = list(account_ids)
+        if not account_ids:
+            return {}
+        return {
+            account.id: account
+            for account in db.query(Account).filter(Account.id.in_(account_ids)).all()
+        }
+
     @staticmethod
     def get_by_account_number(db: Session, account_number: str) -> Optional[Account]:
         return db.query(Account).filter(Account.account_number == account_number).first()
@@ -27,6 +54,18 @@ class AccountService:
             .all()
         )
 
+    @staticmethod
+    def iter_user_accounts(
+        db: Session, user_id: int, chunk_size: int = 200
+    ) -> Iterator[Account]:
+        """Stream a user's accounts from a server-side cursor, chunk_size rows at a time."""
+        yield from (
+            db.query(Account)
+            .filter(Account.user_id == user_id)
+            .order_by(Account.id)
+            .yield_per(chunk_size)
+        )
+
     @staticmethod
     def create(
         db: Session,
@@ -36,31 +75,27 @@ class AccountService:
         currency: str = "USD",
         initial_balance: Decimal = Decimal("0")
     ) -> Account:
-        account_number = str(uuid.uuid4().int)[:12]
-        db_obj = Account(
-            account_number=account_number,
-            user_id=user_id,
-            type=type,
-            status=AccountStatus.ACTIVE,
-            balance=initial_balance,
-            currency=currency,
-            daily_transfer_limit=Decimal("10000"),
-            withdrawal_limit=Decimal("5000"),
-            interest_rate=Decimal("0.01"),
-            features={
-                "debit_card": True,
-                "online_banking": True,
-                "mobile_banking": True
-            },
-            metadata={
-                "created_through": "api",
-                "risk_assessment": "low"
-            }
-        )
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+        for attempt in range(ACCOUNT_NUMBER_ATTEMPTS):
+            account_number = f"{secrets.randbelow(10**12):012d}"
+            db_obj = Account(
+                account_number=account_number,
+                user_id=user_id,
+                type=type,
+                status=AccountStatus.ACTIVE,
+                balance=initial_balance,
+                currency=currency
+            )
+            db.add(db_obj)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Account number collision; roll back and draw another
+                db.rollback()
+                if attempt == ACCOUNT_NUMBER_ATTEMPTS - 1:
+                    raise
+                continue
+            db.refresh(db_obj)
+            return db_obj
 
     @staticmethod
     def update_balance(
@@ -68,19 +103,27 @@ class AccountService:
         *,
         account_id: int,
         amount: Decimal,
-        operation: str
+        operation: str,
+        account: Optional[Account] = None,
+        commit: bool = True
     ) -> Account:
-        account = AccountService.get(db, account_id=account_id)
+        # Apply the delta in SQL so concurrent updates cannot lose writes
+        stmt = update(Account).where(Account.id == account_id)
         if operation == "credit":
-            account.balance += amount
+            stmt = stmt.values(balance=Account.balance + amount)
         elif operation == "debit":
-            if account.balance < amount:
-                raise ValueError("Insufficient funds")
-            account.balance -= amount
-        
-        db.add(account)
-        db.commit()
-        db.refresh(account)
+            stmt = stmt.where(Account.balance >= amount).values(balance=Account.balance - amount)
+        else:
+            raise ValueError(f"Unsupported operation: {operation}")
+
+        result = db.execute(stmt.execution_options(synchronize_session="fetch"))
+        if result.rowcount == 0:
+            if AccountService.get(db, account_id=account_id) is None:
+                raise ValueError("Account not found")
+            raise ValueError("Insufficient funds")
+
+        account = account or AccountService.get(db, account_id=account_id)
+        AccountService._finish(db, account, commit)
         return account
 
     @staticmethod
@@ -88,13 +131,14 @@ class AccountService:
         db: Session,
         *,
         account_id: int,
-        status: AccountStatus
+        status: AccountStatus,
+        account: Optional[Account] = None,
+        commit: bool = True
     ) -> Account:
-        account = AccountService.get(db, account_id=account_id)
+        account = account or AccountService.get(db, account_id=account_id)
         account.status = status
         db.add(account)
-        db.commit()
-        db.refresh(account)
+        AccountService._finish(db, account, commit)
         return account
 
     @staticmethod
@@ -103,9 +147,11 @@ class AccountService:
         *,
         account_id: int,
         daily_transfer_limit: Optional[Decimal] = None,
-        withdrawal_limit: Optional[Decimal] = None
+        withdrawal_limit: Optional[Decimal] = None,
+        account: Optional[Account] = None,
+        commit: bool = True
     ) -> Account:
-        account = AccountService.get(db, account_id=account_id)
+        account = account or AccountService.get(db, account_id=account_id)
         
         if daily_transfer_limit is not None:
             account.daily_transfer_limit = daily_transfer_limit
@@ -113,8 +159,7 @@ class AccountService:
             account.withdrawal_limit = withdrawal_limit
             
         db.add(account)
-        db.commit()
-        db.refresh(account)
+        AccountService._finish(db, account, commit)
         return account
 
     @staticmethod
@@ -1,6 +1,8 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
 import pandas as pd
 import numpy as np
 from app.schemas.advisor import *
@@ -10,26 +12,54 @@ from app.models.investment import Portfolio, Holding, InvestmentTransaction
 from app.services.budget_service import BudgetService
 from app.services.investment_service import InvestmentService
 
+ALERT_LOOKBACK = timedelta(days=7)
+LARGE_TRANSACTION_THRESHOLD = 1000
+BUDGET_WARNING_PERCENT = 90
+STRONG_RETURN_PERCENT = 10
+HIGH_VOLATILITY = 0.2
+
+@dataclass
+class TransactionFacts:
+    """Aggregates over a user's transactions, computed once per request"""
+    count: int
+    total: float
+    mean: float
+    by_category: pd.Series
+    by_month: pd.Series
+
+def _sum_by(keys: pd.Series, amounts: np.ndarray) -> pd.Series:
+    """Sum amounts per sorted key with a factorize + bincount pass; null keys are dropped."""
+    codes, uniques = pd.factorize(keys, sort=True)
+    mask = codes >= 0
+    sums = np.bincount(codes[mask], weights=amounts[mask], minlength=len(uniques))
+    return pd.Series(sums, index=uniques)
+
 class AIAdvisorService:
     def __init__(self, db: Session):
         self.db = db
         self.budget_service = BudgetService(db)
         self.investment_service = InvestmentService(db)
+        # Per-instance memo so one request fanning out into several views
+        # queries each user's data only once
+        self._txn_cache: Dict[int, pd.DataFrame] = {}
+        self._risk_profile_cache: Dict[int, str] = {}
+        self._portfolio_cache: Dict[int, List[Portfolio]] = {}
+        self._facts_cache: Dict[int, TransactionFacts] = {}
 
     def get_comprehensive_insights(self, user_id: int) -> InsightResponse:
         # Analyze recent transactions, budgets, and investments
-        transactions_df = self._get_user_transactions_df(user_id)
+        facts = self._get_transaction_facts(user_id)
         budget_analysis = self._analyze_budget_performance(user_id)
         investment_analysis = self._analyze_investment_performance(user_id)
         
         # Generate key findings and alerts
         key_findings = self._generate_key_findings(
-            transactions_df, 
+            facts, 
             budget_analysis, 
             investment_analysis
         )
         alerts = self._generate_alerts(
-            transactions_df, 
+            user_id, 
             budget_analysis, 
             investment_analysis
         )
@@ -42,16 +72,16 @@ class AIAdvisorService:
 
     def _analyze_spending_patterns(self, user_id: int) -> SpendingAnalysisResponse:
         # Get transaction data
-        transactions_df = self._get_user_transactions_df(user_id)
+        facts = self._get_transaction_facts(user_id)
         
         # Calculate monthly trends
-        monthly_trends = self._calculate_monthly_trends(transactions_df)
+        monthly_trends = self._calculate_monthly_trends(facts)
         
         # Calculate category breakdown
-        category_breakdown = self._calculate_category_breakdown(transactions_df)
+        category_breakdown = self._calculate_category_breakdown(facts)
         
         # Generate spending insights
-        insights = self._generate_spending_insights(transactions_df)
+        insights = self._generate_spending_insights(facts)
         
         return SpendingAnalysisResponse(
             monthly_trends=monthly_trends,
@@ -61,12 +91,12 @@ class AIAdvisorService:
 
     def _generate_budget_recommendations(self, user_id: int) -> BudgetRecommendationsResponse:
         # Analyze current spending patterns
-        transactions_df = self._get_user_transactions_df(user_id)
+        facts = self._get_transaction_facts(user_id)
         current_budgets = self.budget_service.get_user_budgets(user_id)
         
         # Generate recommendations based on spending patterns and financial goals
         recommendations = self._calculate_budget_recommendations(
-            transactions_df, 
+            facts, 
             current_budgets
         )
         
@@ -77,7 +107,7 @@ class AIAdvisorService:
 
     def _generate_investment_recommendations(self, user_id: int) -> InvestmentRecommendationsResponse:
         # Analyze current portfolio
-        portfolio = self.investment_service.get_user_portfolios(user_id)
+        portfolio = self._load_portfolio_graph(user_id)
         risk_profile = self._determine_risk_profile(user_id)
         
         # Generate recommendations based on risk profile and market conditions
@@ -138,40 +168,155 @@ class AIAdvisorService:
         )
 
     # Helper methods for data processing and analysis
-    def _get_user_transactions_df(self, user_id: int) -> pd.DataFrame:
-        transactions = self.db.query(Transaction).filter(
+    def _get_user_transactions_df(
+        self,
+        user_id: int,
+        since: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        if user_id in self._txn_cache:
+            df = self._txn_cache[user_id]
+            return df if since is None else df[df['date'] >= since]
+
+        query = self.db.query(
+            Transaction.created_at.label('date'),
+            Transaction.amount,
+            Transaction.category,
+            Transaction.type,
+            Transaction.description
+        ).filter(
+            Transaction.user_id == user_id
+        )
+        if since is not None:
+            query = query.filter(Transaction.created_at >= since)
+        rows = query.all()
+
+        if not rows:
+            df = pd.DataFrame(columns=['date', 'amount', 'category', 'type', 'description'])
+        else:
+            # Build the frame column-wise instead of one dict per transaction
+            dates, amounts, categories, types, descriptions = zip(*rows)
+            df = pd.DataFrame({
+                'date': pd.to_datetime(dates),
+                'amount': np.asarray(amounts, dtype='float64'),
+                'category': pd.Categorical(categories),
+                'type': pd.Categorical(types),
+                'description': descriptions
+            })
+
+        # Only full histories are memoized; windowed loads are one-off
+        if since is None:
+            self._txn_cache[user_id] = df
+        return df
+
+    def _get_transaction_facts(self, user_id: int) -> TransactionFacts:
+        """Aggregate the user's transactions in one pass and memoize the result."""
+        if user_id in self._facts_cache:
+            return self._facts_cache[user_id]
+
+        if user_id in self._txn_cache:
+            facts = self._facts_from_frame(self._txn_cache[user_id])
+        else:
+            facts = self._facts_from_sql(user_id)
+
+        self._facts_cache[user_id] = facts
+        return facts
+
+    def _facts_from_frame(self, df: pd.DataFrame) -> TransactionFacts:
+        if df.empty:
+            return TransactionFacts(
+                count=0,
+                total=0.0,
+                mean=float('nan'),
+                by_category=pd.Series(dtype='float64'),
+                by_month=pd.Series(dtype='float64')
+            )
+
+        amounts = df['amount'].to_numpy()
+        return TransactionFacts(
+            count=len(amounts),
+            total=float(amounts.sum()),
+            mean=float(amounts.mean()),
+            by_category=_sum_by(df['category'], amounts),
+            by_month=_sum_by(df['date'].dt.to_period('M'), amounts)
+        )
+
+    def _facts_from_sql(self, user_id: int) -> TransactionFacts:
+        """Let the database group by category and month so raw rows never leave it."""
+        category_rows = self.db.query(
+            Transaction.category,
+            func.count(Transaction.id),
+            func.sum(Transaction.amount)
+        ).filter(
             Transaction.user_id == user_id
-        ).all()
-        
-        return pd.DataFrame([{
-            'date': t.date,
-            'amount': t.amount,
-            'category': t.category,
-            'type': t.type,
-            'description': t.description
-        } for t in transactions])
-
-    def _calculate_monthly_trends(self, df: pd.DataFrame) -> List[SpendingTrend]:
-        monthly = df.groupby(df['date'].dt.strftime('%Y-%m'))[['amount']].sum()
+        ).group_by(Transaction.category).order_by(Transaction.category).all()
+
+        month = func.date_trunc('month', Transaction.created_at)
+        month_rows = self.db.query(
+            month,
+            func.sum(Transaction.amount)
+        ).filter(
+            Transaction.user_id == user_id
+        ).group_by(month).order_by(month).all()
+
+        count = sum(n for _, n, _ in category_rows)
+        total = float(sum(amount for _, _, amount in category_rows))
+        named = [(category, float(amount)) for category, _, amount in category_rows if category is not None]
+        return TransactionFacts(
+            count=count,
+            total=total,
+            mean=total / count if count else float('nan'),
+            by_category=pd.Series(
+                [amount for _, amount in named],
+                index=[category for category, _ in named],
+                dtype='float64'
+            ),
+            by_month=pd.Series(
+                [float(amount) for _, amount in month_rows],
+                index=pd.DatetimeIndex([m for m, _ in month_rows]).to_period('M'),
+                dtype='float64'
+            )
+        )
+
+    def _load_portfolio_graph(self, user_id: int) -> List[Portfolio]:
+        """Load a user's portfolios with holdings and their transactions eagerly."""
+        if user_id not in self._portfolio_cache:
+            self._portfolio_cache[user_id] = self.db.query(Portfolio).options(
+                selectinload(Portfolio.holdings).selectinload(Holding.transactions)
+            ).filter(
+                Portfolio.user_id == user_id
+            ).all()
+        return self._portfolio_cache[user_id]
+
+    def invalidate_cache(self, user_id: int) -> None:
+        """Drop memoized data for a user after their transactions change."""
+        self._txn_cache.pop(user_id, None)
+        self._risk_profile_cache.pop(user_id, None)
+        self._portfolio_cache.pop(user_id, None)
+        self._facts_cache.pop(user_id, None)
+
+    def _calculate_monthly_trends(self, facts: TransactionFacts) -> List[SpendingTrend]:
+        monthly = facts.by_month
+        # tolist() already yields Python floats, so no per-item conversion
         return [
-            SpendingTrend(month=month, amount=float(amount))
-            for month, amount in monthly.itertuples()
+            SpendingTrend(month=month, amount=amount)
+            for month, amount in zip(monthly.index.strftime('%Y-%m'), monthly.tolist())
         ]
 
-    def _calculate_category_breakdown(self, df: pd.DataFrame) -> List[CategorySpending]:
-        category_totals = df.groupby('category')['amount'].sum()
-        total_spending = category_totals.sum()
+    def _calculate_category_breakdown(self, facts: TransactionFacts) -> List[CategorySpending]:
+        category_totals = facts.by_category
+        percentages = category_totals / category_totals.sum() * 100
         
         return [
-            CategorySpending(
-                category=category,
-                amount=float(amount),
-                percentage=float(amount / total_spending * 100)
+            CategorySpending(category=category, amount=amount, percentage=percentage)
+            for category, amount, percentage in zip(
+                category_totals.index, category_totals.tolist(), percentages.tolist()
             )
-            for category, amount in category_totals.items()
         ]
 
     def _determine_risk_profile(self, user_id: int) -> str:
+        if user_id in self._risk_profile_cache:
+            return self._risk_profile_cache[user_id]
+
         # Analyze various factors to determine risk profile
         # This is a simplified version - in reality, would use more sophisticated analysis
         investment_history = self.investment_service.get_investment_history(user_id)
@@ -186,74 +331,86 @@ class AIAdvisorService:
         risk_score = self._calculate_risk_score(volatility, income_stability, debt_ratio)
         
         if risk_score < 0.3:
-            return "Conservative"
+            profile = "Conservative"
         elif risk_score < 0.7:
-            return "Moderate"
+            profile = "Moderate"
         else:
-            return "Aggressive"
+            profile = "Aggressive"
+
+        self._risk_profile_cache[user_id] = profile
+        return profile
 
     def _generate_key_findings(
         self, 
-        transactions_df: pd.DataFrame, 
+        facts: TransactionFacts, 
         budget_analysis: Dict, 
         investment_analysis: Dict
     ) -> List[str]:
         findings = []
         
         # Analyze spending patterns
-        if not transactions_df.empty:
-            recent_spending = transactions_df['amount'].sum()
-            avg_spending = transactions_df['amount'].mean()
+        if facts.count:
+            recent_spending = facts.total
+            avg_spending = facts.mean
             
             if recent_spending > avg_spending * 1.2:
                 findings.append("Spending has increased by 20% compared to your average")
         
         # Analyze budget performance
-        for category, performance in budget_analysis.items():
-            if performance['percentage'] > 90:
-                findings.append(f"You're close to exceeding your {category} budget")
+        findings.extend(
+            f"You're close to exceeding your {category} budget"
+            for category, performance in budget_analysis.items()
+            if performance['percentage'] > BUDGET_WARNING_PERCENT
+        )
         
         # Analyze investment performance
-        for asset, performance in investment_analysis.items():
-            if performance['return'] > 10:
-                findings.append(f"Your {asset} investments are performing well")
+        findings.extend(
+            f"Your {asset} investments are performing well"
+            for asset, performance in investment_analysis.items()
+            if performance['return'] > STRONG_RETURN_PERCENT
+        )
         
         return findings
 
     def _generate_alerts(
         self, 
-        transactions_df: pd.DataFrame, 
+        user_id: int, 
         budget_analysis: Dict, 
         investment_analysis: Dict
     ) -> List[str]:
         alerts = []
         
         # Check for unusual transactions
-        recent_transactions = transactions_df[
-            transactions_df['date'] >= datetime.now() - timedelta(days=7)
-        ]
+        cutoff = datetime.now() - ALERT_LOOKBACK
+        recent_transactions = self._get_user_transactions_df(user_id, since=cutoff)
         
-        for _, transaction in recent_transactions.iterrows():
-            if transaction['amount'] > 1000:  # Threshold for large transactions
-                alerts.append(f"Large transaction detected: ${transaction['amount']} on {transaction['date']}")
+        large = recent_transactions[recent_transactions['amount'] > LARGE_TRANSACTION_THRESHOLD]
+        alerts.extend(
+            f"Large transaction detected: ${amount} on {date}"
+            for amount, date in zip(large['amount'].tolist(), large['date'].tolist())
+        )
         
         # Check budget overruns
-        for category, performance in budget_analysis.items():
-            if performance['percentage'] > 100:
-                alerts.append(f"Budget exceeded for {category}")
+        alerts.extend(
+            f"Budget exceeded for {category}"
+            for category, performance in budget_analysis.items()
+            if performance['percentage'] > 100
+        )
         
         # Check investment alerts
-        for asset, performance in investment_analysis.items():
-            if performance['volatility'] > 0.2:  # High volatility threshold
-                alerts.append(f"High volatility detected in {asset} investments")
+        alerts.extend(
+            f"High volatility detected in {asset} investments"
+            for asset, performance in investment_analysis.items()
+            if performance['volatility'] > HIGH_VOLATILITY
+        )
         
         return alerts
 
-    def _generate_spending_insights(self, df: pd.DataFrame) -> List[str]:
+    def _generate_spending_insights(self, facts: TransactionFacts) -> List[str]:
         insights = []
         
         # Analyze spending trends
-        monthly_spending = df.groupby(df['date'].dt.strftime('%Y-%m'))['amount'].sum()
+        monthly_spending = facts.by_month
         if len(monthly_spending) >= 2:
             current_month = monthly_spending.iloc[-1]
             previous_month = monthly_spending.iloc[-2]
@@ -266,7 +423,7 @@ class AIAdvisorService:
                 )
         
         # Analyze category patterns
-        category_spending = df.groupby('category')['amount'].sum()
+        category_spending = facts.by_category
         top_category = category_spending.idxmax()
         top_amount = category_spending.max()
         
@@ -279,15 +436,13 @@ class AIAdvisorService:
 
     def _calculate_budget_recommendations(
         self, 
-        transactions_df: pd.DataFrame, 
+        facts: TransactionFacts, 
         current_budgets: List[Budget]
     ) -> List[BudgetRecommendation]:
         recommendations = []
         
         for budget in current_budgets:
-            category_spending = transactions_df[
-                transactions_df['category'] == budget.category
-            ]['amount'].sum()
+            category_spending = float(facts.by_category.get(budget.category, 0.0))
             
             if category_spending > budget.amount * 1.1:  # Over budget by 10%
                 recommendations.append(
@@ -337,15 +492,29 @@ class AIAdvisorService:
         return opportunities
 
     def _identify_recurring_expenses(self, df: pd.DataFrame) -> Dict[str, float]:
-        # Group by category and description
-        grouped = df.groupby(['category', 'description'])
-        
+        # Group by category and description; ids follow sorted key order and rows
+        # with a NULL key come back as NaN, mapped to -1 so the ids stay integral
+        group_ids = df.groupby(['category', 'description'], observed=True).ngroup().fillna(-1).to_numpy(np.int64)
+        keep = group_ids >= 0
+        if not keep.any():
+            return {}
+        group_ids = group_ids[keep]
+        amounts = df['amount'].to_numpy()[keep]
+        categories = df['category'].to_numpy()[keep]
+        
+        # Per-group size, sum and distinct-amount count as flat bincounts
+        n_groups = group_ids.max() + 1
+        sizes = np.bincount(group_ids, minlength=n_groups)
+        sums = np.bincount(group_ids, weights=amounts, minlength=n_groups)
+        distinct = pd.DataFrame({'g': group_ids, 'a': amounts}).drop_duplicates()['g'].to_numpy()
+        n_unique = np.bincount(distinct, minlength=n_groups)
+        group_category = np.empty(n_groups, dtype=object)
+        group_category[group_ids] = categories
+        
+        # At least 3 occurrences with similar amounts; later groups win per category
         recurring = {}
-        for (category, description), group in grouped:
-            if len(group) >= 3:  # At least 3 occurrences
-                amounts = group['amount'].tolist()
-                if len(set(amounts)) <= 2:  # Similar amounts
-                    recurring[category] = sum(amounts) / len(amounts)
+        for g in np.flatnonzero((sizes >= 3) & (n_unique <= 2)):
+            recurring[group_category[g]] = sums[g] / sizes[g]
         
         return recurring
 
@@ -1,88 +1,128 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from datetime import datetime, timedelta
+from itertools import islice
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from app.models.transaction import Transaction
-from app.models.user import User
+from sqlalchemy import func, and_, case
+from app.models.transaction import Transaction, TransactionType
 from app.models.account import Account
-import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-import pandas as pd
 from fastapi import HTTPException
 
+INSIGHTS_FETCH_SIZE = 2000
+# Money leaving and entering an account, as classified by transaction statistics
+DEBIT_TYPES = (TransactionType.WITHDRAWAL, TransactionType.PAYMENT)
+CREDIT_TYPES = (TransactionType.DEPOSIT, TransactionType.INTEREST)
+
+def _group_moments(codes: "np.ndarray", values: "np.ndarray", n_groups: int) -> Tuple["np.ndarray", ...]:
+    """Per-group count, sum, mean and sample std (NaN for single-row groups) via bincount."""
+    import numpy as np
+    counts = np.bincount(codes, minlength=n_groups)
+    totals = np.bincount(codes, weights=values, minlength=n_groups)
+    means = totals / counts
+    squares = np.bincount(codes, weights=(values - means[codes]) ** 2, minlength=n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stds = np.where(counts > 1, np.sqrt(squares / (counts - 1)), np.nan)
+    return counts, totals, means, stds
+
+def _outlier_mask(codes: "np.ndarray", values: "np.ndarray", means: "np.ndarray", stds: "np.ndarray") -> "np.ndarray":
+    """Rows more than two standard deviations above their group's mean."""
+    return values > (means + 2 * stds)[codes]
+
 class AiInsightsService:
     def __init__(self, db: Session):
         self.db = db
 
     async def generate_spending_insights(self, user_id: int) -> Dict[str, Any]:
         """Generate AI-powered spending insights for the user"""
+        # Imported here so workers that never serve insights skip loading numpy
+        import numpy as np
+
         try:
             # Get user's transactions for the last 3 months
             three_months_ago = datetime.utcnow() - timedelta(days=90)
-            transactions = (
-                self.db.query(Transaction)
+            # Project only the needed columns; category is pulled out of the JSON in SQL
+            rows = (
+                self.db.query(
+                    Transaction.amount,
+                    func.coalesce(Transaction.metadata["category"].astext, "uncategorized").label("category"),
+                    Transaction.created_at
+                )
                 .filter(
                     Transaction.user_id == user_id,
                     Transaction.created_at >= three_months_ago,
-                    Transaction.type == "debit"
+                    Transaction.type.in_(DEBIT_TYPES)
                 )
-                .all()
+                .yield_per(INSIGHTS_FETCH_SIZE)
             )
 
-            if not transactions:
+            # Stream rows in batches into typed column arrays so the full
+            # result set never sits in memory as Row objects
+            # One result iterator: iterating the Query itself would re-run the SELECT per batch
+            result = iter(rows)
+            amounts, categories, dates = [], [], []
+            for batch in iter(lambda: list(islice(result, INSIGHTS_FETCH_SIZE)), []):
+                batch_amounts, batch_categories, batch_dates = zip(*batch)
+                amounts.append(np.asarray(batch_amounts, dtype="float64"))
+                categories.append(np.asarray(batch_categories, dtype=object))
+                dates.append(np.asarray(batch_dates, dtype="datetime64[us]"))
+
+            if not amounts:
                 return {
                     "message": "Not enough transaction data to generate insights",
                     "insights": []
                 }
 
-            # Prepare data for analysis
-            df = pd.DataFrame([
-                {
-                    "amount": t.amount,
-                    "category": t.metadata.get("category", "uncategorized"),
-                    "date": t.created_at,
-                    "day_of_week": t.created_at.strftime("%A"),
-                    "hour": t.created_at.hour
-                }
-                for t in transactions
-            ])
+            # Prepare data for analysis as flat column arrays
+            amount = np.concatenate(amounts)
+            created = np.concatenate(dates)
+            hour = (created.astype("datetime64[h]") - created.astype("datetime64[D]")).astype(np.int64)
+            category_names, codes = np.unique(np.concatenate(categories), return_inverse=True)
+            n_categories = len(category_names)
 
             insights = []
 
+            counts, totals, means, stds = _group_moments(codes, amount, n_categories)
+
             # Spending patterns by category
-            category_spending = df.groupby("category")["amount"].agg(["sum", "count"]).reset_index()
-            for _, row in category_spending.iterrows():
+            for category, total, count in zip(category_names.tolist(), totals.tolist(), counts.tolist()):
                 insights.append({
                     "type": "category_insight",
-                    "category": row["category"],
-                    "total_spent": float(row["sum"]),
-                    "transaction_count": int(row["count"]),
-                    "message": f"You've spent {row['sum']:.2f} on {row['category']} across {row['count']} transactions"
+                    "category": category,
+                    "total_spent": float(total),
+                    "transaction_count": int(count),
+                    "message": f"You've spent {total:.2f} on {category} across {count} transactions"
                 })
 
-            # Unusual spending patterns
-            category_means = df.groupby("category")["amount"].mean()
-            category_stds = df.groupby("category")["amount"].std()
-            
-            for category in category_means.index:
-                unusual_transactions = df[
-                    (df["category"] == category) &
-                    (df["amount"] > category_means[category] + 2 * category_stds[category])
-                ]
-                if not unusual_transactions.empty:
-                    insights.append({
-                        "type": "unusual_spending",
-                        "category": category,
-                        "transactions": unusual_transactions["amount"].tolist(),
-                        "message": f"Found {len(unusual_transactions)} unusually large transactions in {category}"
-                    })
+            # Unusual spending patterns: one mask, then split the matches by category
+            unusual = _outlier_mask(codes, amount, means, stds)
+            unusual_codes = codes[unusual]
+            order = np.argsort(unusual_codes, kind="stable")
+            present, starts = np.unique(unusual_codes[order], return_index=True)
+            for code, group in zip(present.tolist(), np.split(amount[unusual][order], starts[1:])):
+                category = category_names[code]
+                insights.append({
+                    "type": "unusual_spending",
+                    "category": category,
+                    "transactions": group.tolist(),
+                    "message": f"Found {len(group)} unusually large transactions in {category}"
+                })
 
-            # Spending trends
-            monthly_spending = df.set_index("date").resample("M")["amount"].sum()
-            if len(monthly_spending) >= 2:
-                trend_percentage = ((monthly_spending.iloc[-1] - monthly_spending.iloc[-2]) 
-                                 / monthly_spending.iloc[-2] * 100)
+            # Spending trends: this month against last month, summed in SQL
+            this_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            last_month = (this_month - timedelta(days=1)).replace(day=1)
+            current_total, previous_total = (
+                self.db.query(
+                    func.sum(case((Transaction.created_at >= this_month, Transaction.amount))),
+                    func.sum(case((Transaction.created_at < this_month, Transaction.amount)))
+                )
+                .filter(
+                    Transaction.user_id == user_id,
+                    Transaction.type.in_(DEBIT_TYPES),
+                    Transaction.created_at >= last_month
+                )
+                .one()
+            )
+            if current_total is not None and previous_total:
+                trend_percentage = (current_total - previous_total) / previous_total * 100
                 insights.append({
                     "type": "spending_trend",
                     "trend_percentage": float(trend_percentage),
@@ -90,36 +130,37 @@ class AiInsightsService:
                              f"by {abs(trend_percentage):.1f}% compared to last month"
                 })
 
-            # Peak spending times
-            hourly_spending = df.groupby("hour")["amount"].sum()
-            peak_hour = hourly_spending.idxmax()
+            # Peak spending times, among hours that have any spending
+            hourly_spending = np.bincount(hour, weights=amount, minlength=24)
+            hourly_spending[np.bincount(hour, minlength=24) == 0] = -np.inf
+            peak_hour = int(hourly_spending.argmax())
             insights.append({
                 "type": "peak_spending_time",
-                "hour": int(peak_hour),
+                "hour": peak_hour,
                 "amount": float(hourly_spending[peak_hour]),
                 "message": f"You tend to spend most around {peak_hour:02d}:00"
             })
 
-            # Spending clusters
-            if len(df) >= 5:  # Minimum data points for clustering
-                scaler = StandardScaler()
-                features = scaler.fit_transform(df[["amount", "hour"]].values)
-                kmeans = KMeans(n_clusters=3, random_state=42)
-                df["cluster"] = kmeans.fit_predict(features)
+            # Spending clusters: amount terciles stand in for a k-means fit
+            if len(amount) >= 5:  # Minimum data points for clustering
+                edges = np.unique(np.quantile(amount, [0, 1 / 3, 2 / 3, 1]))
+                cluster_ids = np.searchsorted(edges[1:-1], amount, side="left")
 
-                for cluster in range(3):
-                    cluster_data = df[df["cluster"] == cluster]
-                    if len(cluster_data) > 0:
-                        insights.append({
-                            "type": "spending_cluster",
-                            "cluster_id": int(cluster),
-                            "average_amount": float(cluster_data["amount"].mean()),
-                            "common_hour": int(cluster_data["hour"].mode()[0]),
-                            "transaction_count": len(cluster_data),
-                            "message": f"Found a spending pattern: {len(cluster_data)} transactions "
-                                     f"averaging {cluster_data['amount'].mean():.2f} "
-                                     f"typically around {cluster_data['hour'].mode()[0]:02d}:00"
-                        })
+                for cluster in np.unique(cluster_ids).tolist():
+                    in_cluster = cluster_ids == cluster
+                    transaction_count = int(in_cluster.sum())
+                    average_amount = float(amount[in_cluster].mean())
+                    common_hour = int(np.bincount(hour[in_cluster], minlength=24).argmax())
+                    insights.append({
+                        "type": "spending_cluster",
+                        "cluster_id": cluster,
+                        "average_amount": average_amount,
+                        "common_hour": common_hour,
+                        "transaction_count": transaction_count,
+                        "message": f"Found a spending pattern: {transaction_count} transactions "
+                                 f"averaging {average_amount:.2f} "
+                                 f"typically around {common_hour:02d}:00"
+                    })
 
             return {
                 "message": "Successfully generated insights",
@@ -136,14 +177,16 @@ class AiInsightsService:
         """Generate AI-powered savings recommendations"""
         try:
             # Get user's financial data
-            user = self.db.query(User).filter(User.id == user_id).first()
-            accounts = self.db.query(Account).filter(Account.user_id == user_id).all()
+            total_balance = float(
+                self.db.query(func.sum(Account.balance))
+                .filter(Account.user_id == user_id)
+                .scalar() or 0
+            )
             
             recommendations = []
 
             # Analyze spending patterns
-            monthly_expenses = await self._calculate_monthly_expenses(user_id)
-            monthly_income = await self._calculate_monthly_income(user_id)
+            monthly_expenses, monthly_income = await self._calculate_monthly_cashflow(user_id)
 
             if monthly_income and monthly_expenses:
                 # Calculate savings potential
@@ -172,7 +215,6 @@ class AiInsightsService:
                 })
 
             # Generate emergency fund recommendation
-            total_balance = sum(account.balance for account in accounts)
             recommended_emergency_fund = monthly_expenses * 6  # 6 months of expenses
             
             if total_balance < recommended_emergency_fund:
@@ -196,63 +238,51 @@ class AiInsightsService:
                 detail=f"Error generating savings recommendations: {str(e)}"
             )
 
-    async def _calculate_monthly_expenses(self, user_id: int) -> float:
-        """Calculate average monthly expenses"""
+    async def _calculate_monthly_cashflow(self, user_id: int) -> Tuple[float, float]:
+        """Calculate last month's expenses and income in a single scan"""
         one_month_ago = datetime.utcnow() - timedelta(days=30)
-        expenses = (
-            self.db.query(func.sum(Transaction.amount))
-            .filter(
-                Transaction.user_id == user_id,
-                Transaction.type == "debit",
-                Transaction.created_at >= one_month_ago
+        expenses, income = (
+            self.db.query(
+                func.sum(case((Transaction.type.in_(DEBIT_TYPES), Transaction.amount), else_=0)),
+                func.sum(case((Transaction.type.in_(CREDIT_TYPES), Transaction.amount), else_=0))
             )
-            .scalar() or 0
-        )
-        return float(expenses)
-
-    async def _calculate_monthly_income(self, user_id: int) -> float:
-        """Calculate average monthly income"""
-        one_month_ago = datetime.utcnow() - timedelta(days=30)
-        income = (
-            self.db.query(func.sum(Transaction.amount))
             .filter(
                 Transaction.user_id == user_id,
-                Transaction.type == "credit",
                 Transaction.created_at >= one_month_ago
             )
-            .scalar() or 0
+            .one()
         )
-        return float(income)
+        return float(expenses or 0), float(income or 0)
 
     async def _identify_recurring_expenses(self, user_id: int) -> List[Dict[str, Any]]:
         """Identify recurring expenses"""
         three_months_ago = datetime.utcnow() - timedelta(days=90)
-        transactions = (
-            self.db.query(Transaction)
+
+        # Group by description and amount in the database; only recurring groups come back
+        frequency = func.count(Transaction.id)
+        groups = (
+            self.db.query(
+                Transaction.description,
+                Transaction.amount,
+                frequency.label("frequency"),
+                func.max(Transaction.created_at).label("last_date")
+            )
             .filter(
                 Transaction.user_id == user_id,
-                Transaction.type == "debit",
+                Transaction.type.in_(DEBIT_TYPES),
                 Transaction.created_at >= three_months_ago
             )
+            .group_by(Transaction.description, Transaction.amount)
+            .having(frequency >= 3)  # At least 3 occurrences to be considered recurring
             .all()
         )
 
-        # Group transactions by description and amount
-        transaction_groups = {}
-        for t in transactions:
-            key = (t.description, t.amount)
-            if key not in transaction_groups:
-                transaction_groups[key] = []
-            transaction_groups[key].append(t)
-
-        recurring_expenses = []
-        for (description, amount), group in transaction_groups.items():
-            if len(group) >= 3:  # At least 3 occurrences to be considered recurring
-                recurring_expenses.append({
-                    "description": description,
-                    "amount": float(amount),
-                    "frequency": len(group),
-                    "last_date": max(t.created_at for t in group).isoformat()
-                })
-
-        return recurring_expenses
+        return [
+            {
+                "description": description,
+                "amount": float(amount),
+                "frequency": count,
+                "last_date": last_date.isoformat()
+            }
+            for description, amount, count, last_date in groups
+        ]
@@ -1,44 +1,130 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+import uuid
+from sqlalchemy import insert, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from jose import JWTError, jwt
+from jose.exceptions import ExpiredSignatureError
 from passlib.context import CryptContext
 from app.models.user import User
 from app.models.auth import AuthDevice, MFAMethod, AuthSession, SocialAccount, ConsentRecord
 from app.core.config import settings
 from app.services.notification import NotificationService
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# New hashes use bcrypt over a SHA-256 prehash so passwords longer than
+# bcrypt's 72-byte limit are not silently truncated; plain bcrypt hashes
+# from before the switch still verify.
+pwd_context = CryptContext(
+    schemes=["bcrypt_sha256", "bcrypt"],
+    deprecated="auto",
+    bcrypt_sha256__rounds=12
+)
+
+# Short-lived memo of successful bcrypt checks. Keys are HMACs under a
+# per-process secret so the cache never holds anything password-derived
+# that could be attacked offline. A password change alters the stored
+# hash, so stale entries simply stop matching and age out.
+_VERIFY_CACHE_TTL = 60
+_VERIFY_CACHE_SIZE = 1024
+_verify_cache_key = secrets.token_bytes(32)
+_verify_cache: "OrderedDict[bytes, float]" = OrderedDict()
+_verify_cache_lock = threading.Lock()
+
+def _verify_cache_digest(plain_password: str, hashed_password: str) -> bytes:
+    message = plain_password.encode() + b"\0" + hashed_password.encode()
+    return hmac.new(_verify_cache_key, message, hashlib.sha256).digest()
+
+# Signing parameters resolved once at import rather than on every token
+_ALGORITHM = settings.ALGORITHM
+_SECRET_KEY = settings.SECRET_KEY.encode()
+_REFRESH_KEY = settings.REFRESH_KEY.encode()
+_ACCESS_TOKEN_TTL = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+_REFRESH_TOKEN_TTL = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+# Decoded JWT payloads keyed by (signing key, token). Expiry is re-checked
+# on every hit, so a cached token stops working at the same moment jose
+# would reject it.
+_DECODE_CACHE_TTL = 30
+_DECODE_CACHE_SIZE = 10_000
+_decode_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_decode_cache_lock = threading.Lock()
+
+def _decode_token(token: str, key: bytes) -> Dict[str, Any]:
+    """jwt.decode with a short-lived memo of successfully verified tokens."""
+    cache_key = (key, token)
+    now = time.time()
+    with _decode_cache_lock:
+        entry = _decode_cache.get(cache_key)
+        if entry is not None:
+            cached_until, payload = entry
+            exp = payload.get("exp")
+            if exp is not None and exp <= now:
+                del _decode_cache[cache_key]
+                raise ExpiredSignatureError("Signature has expired.")
+            if cached_until > now:
+                _decode_cache.move_to_end(cache_key)
+                return dict(payload)
+            del _decode_cache[cache_key]
+
+    payload = jwt.decode(token, key, algorithms=[_ALGORITHM], options={"require_exp": True})
+    with _decode_cache_lock:
+        _decode_cache[cache_key] = (now + _DECODE_CACHE_TTL, payload)
+        while len(_decode_cache) > _DECODE_CACHE_SIZE:
+            _decode_cache.popitem(last=False)
+    return dict(payload)
 
 class AuthService:
     def __init__(self, db: Session):
         self.db = db
         self.notification_service = NotificationService(db)
+        # Users already loaded during this request, keyed by email
+        self._user_by_email: Dict[str, User] = {}
+
+    def _get_user_by_email(self, email: str) -> Optional[User]:
+        user = self._user_by_email.get(email)
+        if user is None:
+            user = self.db.query(User).filter(User.email == email).first()
+            if user is not None:
+                self._user_by_email[email] = user
+        return user
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+        digest = _verify_cache_digest(plain_password, hashed_password)
+        now = time.monotonic()
+        with _verify_cache_lock:
+            expires_at = _verify_cache.get(digest)
+            if expires_at is not None and expires_at > now:
+                return True
+
+        if not pwd_context.verify(plain_password, hashed_password):
+            return False
+
+        # Only successful verifications are cached
+        with _verify_cache_lock:
+            _verify_cache[digest] = now + _VERIFY_CACHE_TTL
+            _verify_cache.move_to_end(digest)
+            while len(_verify_cache) > _VERIFY_CACHE_SIZE:
+                _verify_cache.popitem(last=False)
+        return True
 
     def get_password_hash(self, password: str) -> str:
         return pwd_context.hash(password)
 
     def create_access_token(self, data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
-        to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.utcnow() + expires_delta
-        else:
-            expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        
-        to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-        return encoded_jwt
+        expire = datetime.utcnow() + (expires_delta or _ACCESS_TOKEN_TTL)
+        return jwt.encode({**data, "exp": expire}, _SECRET_KEY, algorithm=_ALGORITHM)
 
     def create_refresh_token(self, data: Dict[str, Any]) -> str:
-        to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-        to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, settings.REFRESH_KEY, algorithm=settings.ALGORITHM)
-        return encoded_jwt
+        expire = datetime.utcnow() + _REFRESH_TOKEN_TTL
+        return jwt.encode({**data, "exp": expire}, _REFRESH_KEY, algorithm=_ALGORITHM)
 
     async def authenticate_user(
         self, 
@@ -46,7 +132,7 @@ class AuthService:
         password: str, 
         device_info: Dict[str, Any]
     ) -> Dict[str, Any]:
-        user = self.db.query(User).filter(User.email == email).first()
+        user = self._get_user_by_email(email)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -120,17 +206,7 @@ class AuthService:
         device_info: Dict[str, Any]
     ) -> Dict[str, Any]:
         try:
-            payload = jwt.decode(
-                mfa_token, 
-                settings.SECRET_KEY, 
-                algorithms=[settings.ALGORITHM]
-            )
-            
-            if datetime.fromtimestamp(payload["exp"]) < datetime.utcnow():
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="MFA session expired"
-                )
+            payload = _decode_token(mfa_token, _SECRET_KEY)
 
             if payload["mfa_code"] != mfa_code:
                 raise HTTPException(
@@ -147,6 +223,11 @@ class AuthService:
 
             return await self.create_session(user, device_info)
 
+        except ExpiredSignatureError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="MFA session expired"
+            )
         except JWTError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -158,35 +239,37 @@ class AuthService:
         user: User, 
         device_info: Dict[str, Any]
     ) -> Dict[str, Any]:
-        # Update or create device record
-        device = self.db.query(AuthDevice).filter(
-            AuthDevice.device_id == device_info["device_id"]
-        ).first()
-
-        if not device:
-            device = AuthDevice(
+        # Update or create device record in one statement
+        now = datetime.utcnow()
+        self.db.execute(
+            pg_insert(AuthDevice).values(
                 user_id=user.id,
                 device_id=device_info["device_id"],
                 device_name=device_info.get("device_name"),
                 device_type=device_info.get("device_type"),
                 fingerprint=device_info.get("fingerprint"),
+                last_used=now,
                 metadata=device_info
+            ).on_conflict_do_update(
+                index_elements=[AuthDevice.device_id],
+                set_={"last_used": now}
             )
-            self.db.add(device)
-        
-        device.last_used = datetime.utcnow()
+        )
         
-        # Create new session
-        session = AuthSession(
-            user_id=user.id,
-            device_id=device.device_id,
-            session_token=self._generate_session_token(),
-            refresh_token=self._generate_refresh_token(),
-            ip_address=device_info.get("ip_address"),
-            user_agent=device_info.get("user_agent"),
-            expires_at=datetime.utcnow() + timedelta(days=settings.SESSION_EXPIRE_DAYS)
+        # Create new session; a plain INSERT since nothing reads the row back
+        session_token = self._generate_session_token()
+        session_refresh_token = self._generate_refresh_token()
+        self.db.execute(
+            insert(AuthSession).values(
+                user_id=user.id,
+                device_id=device_info["device_id"],
+                session_token=session_token,
+                refresh_token=session_refresh_token,
+                ip_address=device_info.get("ip_address"),
+                user_agent=device_info.get("user_agent"),
+                expires_at=datetime.utcnow() + timedelta(days=settings.SESSION_EXPIRE_DAYS)
+            )
         )
-        self.db.add(session)
         
         # Update user's last login
         user.last_login = datetime.utcnow()
@@ -195,10 +278,10 @@ class AuthService:
 
         # Generate tokens
         access_token = self.create_access_token(
-            data={"sub": user.email, "session": session.session_token}
+            data={"sub": user.email, "session": session_token}
         )
         refresh_token = self.create_refresh_token(
-            data={"sub": user.email, "session": session.refresh_token}
+            data={"sub": user.email, "session": session_refresh_token}
         )
 
         return {
@@ -219,15 +302,11 @@ class AuthService:
         device_info: Dict[str, Any]
     ) -> Dict[str, Any]:
         try:
-            payload = jwt.decode(
-                refresh_token, 
-                settings.REFRESH_KEY, 
-                algorithms=[settings.ALGORITHM]
-            )
+            payload = _decode_token(refresh_token, _REFRESH_KEY)
             email = payload["sub"]
             session_token = payload["session"]
 
-            user = self.db.query(User).filter(User.email == email).first()
+            user = self._get_user_by_email(email)
             if not user:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -255,18 +334,15 @@ class AuthService:
 
     def _generate_mfa_code(self) -> str:
         """Generate a 6-digit MFA code"""
-        import random
-        return str(random.randint(100000, 999999))
+        return str(secrets.randbelow(900000) + 100000)
 
     def _generate_session_token(self) -> str:
         """Generate a unique session token"""
-        import uuid
-        return str(uuid.uuid4())
+        return uuid.uuid4().hex
 
     def _generate_refresh_token(self) -> str:
         """Generate a unique refresh token"""
-        import uuid
-        return str(uuid.uuid4())
+        return uuid.uuid4().hex
 
     async def register_user(
         self, 
@@ -277,17 +353,15 @@ class AuthService:
         date_of_birth: datetime,
         device_info: Dict[str, Any]
     ) -> Dict[str, Any]:
-        # Check if user already exists
-        if self.db.query(User).filter(User.email == email).first():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-
-        if self.db.query(User).filter(User.phone_number == phone_number).first():
+        # Check if user already exists, by email or phone, in one lookup
+        existing = self.db.query(User.email, User.phone_number).filter(
+            or_(User.email == email, User.phone_number == phone_number)
+        ).first()
+        if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Phone number already registered"
+                detail="Email already registered" if existing.email == email
+                else "Phone number already registered"
             )
 
         # Create user
@@ -312,14 +386,10 @@ class AuthService:
 
     async def verify_email(self, token: str) -> Dict[str, Any]:
         try:
-            payload = jwt.decode(
-                token, 
-                settings.SECRET_KEY, 
-                algorithms=[settings.ALGORITHM]
-            )
+            payload = _decode_token(token, _SECRET_KEY)
             email = payload["sub"]
 
-            user = self.db.query(User).filter(User.email == email).first()
+            user = self._get_user_by_email(email)
             if not user:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -338,7 +408,7 @@ class AuthService:
             )
 
     async def forgot_password(self, email: str) -> Dict[str, Any]:
-        user = self.db.query(User).filter(User.email == email).first()
+        user = self._get_user_by_email(email)
         if not user:
             # Return success even if user doesn't exist for security
             return {"message": "Password reset instructions sent to email"}
@@ -360,14 +430,10 @@ class AuthService:
         new_password: str
     ) -> Dict[str, Any]:
         try:
-            payload = jwt.decode(
-                token, 
-                settings.SECRET_KEY, 
-                algorithms=[settings.ALGORITHM]
-            )
+            payload = _decode_token(token, _SECRET_KEY)
             email = payload["sub"]
 
-            user = self.db.query(User).filter(User.email == email).first()
+            user = self._get_user_by_email(email)
             if not user:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -376,12 +442,13 @@ class AuthService:
 
             # Update password
             user.hashed_password = self.get_password_hash(new_password)
+            self._user_by_email.pop(email, None)
             
             # Invalidate all existing sessions
             self.db.query(AuthSession).filter(
                 AuthSession.user_id == user.id,
                 AuthSession.is_valid == True
-            ).update({"is_valid": False})
+            ).update({"is_valid": False}, synchronize_session=False)
 
             self.db.commit()
 
@@ -1,11 +1,36 @@
+from collections import OrderedDict
 from typing import List, Optional
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+import threading
+import time
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session, contains_eager, selectinload
 from app.models.budget import Budget, BudgetExpense, BudgetAlert, BudgetCategory, BudgetPeriod, AlertType, AlertStatus
 from app.schemas.budget import BudgetCreate, BudgetUpdate, BudgetExpenseCreate
 from app.services.transaction_service import TransactionService
 from app.core.exceptions import NotFoundException, ValidationError
 
+APPROACHING_LIMIT_PERCENT = 80
+OVERSPENT_PERCENT = 100
+
+# Last time each (budget_id, alert type) fired in this process; suppresses re-fires
+ALERT_COOLDOWN = timedelta(days=30).total_seconds()
+_ALERT_CACHE_SIZE = 10_000
+_recent_alerts: "OrderedDict[tuple, float]" = OrderedDict()
+_recent_alerts_lock = threading.Lock()
+
+def _alert_recently_fired(budget_id: int, alert_type: AlertType) -> bool:
+    with _recent_alerts_lock:
+        fired_at = _recent_alerts.get((budget_id, alert_type))
+        return fired_at is not None and time.monotonic() - fired_at < ALERT_COOLDOWN
+
+def _mark_alert_fired(budget_id: int, alert_type: AlertType) -> None:
+    with _recent_alerts_lock:
+        _recent_alerts[(budget_id, alert_type)] = time.monotonic()
+        _recent_alerts.move_to_end((budget_id, alert_type))
+        while len(_recent_alerts) > _ALERT_CACHE_SIZE:
+            _recent_alerts.popitem(last=False)
+
 class BudgetService:
     def __init__(self, db: Session):
         self.db = db
@@ -27,19 +52,26 @@ class BudgetService:
         self.db.refresh(budget)
         return budget
 
-    def get_budget(self, budget_id: int, user_id: int) -> Budget:
+    def get_budget(self, budget_id: int, user_id: int, load_relations: bool = False) -> Budget:
         """Get a specific budget by ID."""
-        budget = self.db.query(Budget).filter(
+        query = self.db.query(Budget).filter(
             Budget.id == budget_id,
             Budget.user_id == user_id
-        ).first()
+        )
+        if load_relations:
+            query = query.options(selectinload(Budget.expenses), selectinload(Budget.alerts))
+        budget = query.first()
         if not budget:
             raise NotFoundException("Budget not found")
         return budget
 
     def get_user_budgets(self, user_id: int) -> List[Budget]:
         """Get all budgets for a user."""
-        return self.db.query(Budget).filter(Budget.user_id == user_id).all()
+        # The response includes every budget's expenses and alerts: one IN query each
+        return self.db.query(Budget).filter(Budget.user_id == user_id).options(
+            selectinload(Budget.expenses),
+            selectinload(Budget.alerts)
+        ).all()
 
     def update_budget(self, budget_id: int, user_id: int, budget_data: BudgetUpdate) -> Budget:
         """Update an existing budget."""
@@ -66,17 +98,60 @@ class BudgetService:
             date=expense_data.date or datetime.utcnow()
         )
         self.db.add(expense)
+        totals = self._add_to_total_spent(budget_id, expense.amount)
+
+        # Check if budget alerts need to be created, in the same transaction
+        if totals:
+            self._check_and_create_alerts(budget_id, *totals, expense_amount=expense.amount)
         self.db.commit()
         self.db.refresh(expense)
-        
-        # Check if budget alerts need to be created
-        self._check_and_create_alerts(budget_id)
         return expense
 
+    def add_expenses_bulk(self, budget_id: int, expense_list: List[BudgetExpenseCreate]) -> int:
+        """Add many expenses to a budget with one INSERT and one alert check."""
+        if not expense_list:
+            return 0
+        now = datetime.utcnow()
+        rows = [
+            {
+                "budget_id": budget_id,
+                "transaction_id": expense.transaction_id,
+                "amount": expense.amount,
+                "description": expense.description,
+                "date": expense.date or now,
+                "created_at": now
+            }
+            for expense in expense_list
+        ]
+        self.db.execute(BudgetExpense.__table__.insert(), rows)
+
+        batch_total = sum(expense.amount for expense in expense_list)
+        totals = self._add_to_total_spent(budget_id, batch_total)
+        if totals:
+            self._check_and_create_alerts(budget_id, *totals, expense_amount=batch_total)
+        self.db.commit()
+        return len(rows)
+
+    def _add_to_total_spent(self, budget_id: int, amount: float):
+        """Bump the running total in SQL so concurrent writers can't lose an update."""
+        return self.db.execute(
+            update(Budget)
+            .where(Budget.id == budget_id)
+            .values(total_spent=Budget.total_spent + amount)
+            .returning(Budget.total_spent, Budget.amount, Budget.category)
+            .execution_options(synchronize_session="fetch")
+        ).first()
+
     def get_budget_summary(self, budget_id: int, user_id: int) -> dict:
         """Get a summary of budget spending and remaining amount."""
         budget = self.get_budget(budget_id, user_id)
-        total_spent = sum(expense.amount for expense in budget.expenses)
+        # Budgets created before total_spent existed start at 0; fill them in on first read
+        if not budget.total_spent and self.db.query(
+            self.db.query(BudgetExpense.id).filter(BudgetExpense.budget_id == budget_id).exists()
+        ).scalar():
+            self.reconcile_total_spent(budget_id)
+            self.db.refresh(budget)
+        total_spent = budget.total_spent
         remaining = budget.amount - total_spent
         percentage_used = (total_spent / budget.amount) * 100 if budget.amount > 0 else 0
 
@@ -90,73 +165,91 @@ class BudgetService:
             "category": budget.category
         }
 
+    def reconcile_total_spent(self, budget_id: Optional[int] = None) -> int:
+        """Recompute running totals from the expense rows; meant for a periodic job."""
+        expense_sum = select(
+            func.coalesce(func.sum(BudgetExpense.amount), 0)
+        ).where(BudgetExpense.budget_id == Budget.id).scalar_subquery()
+        stmt = update(Budget).values(total_spent=expense_sum)
+        if budget_id is not None:
+            stmt = stmt.where(Budget.id == budget_id)
+        result = self.db.execute(stmt.execution_options(synchronize_session=False))
+        self.db.commit()
+        return result.rowcount
+
     def get_category_spending(self, user_id: int, start_date: datetime, end_date: datetime) -> dict:
         """Get spending breakdown by category."""
-        budgets = self.get_user_budgets(user_id)
-        category_spending = {}
+        rows = self.db.query(
+            Budget.category,
+            Budget.amount,
+            func.coalesce(func.sum(BudgetExpense.amount), 0)
+        ).outerjoin(
+            BudgetExpense,
+            (BudgetExpense.budget_id == Budget.id)
+            & (BudgetExpense.date >= start_date)
+            & (BudgetExpense.date <= end_date)
+        ).filter(
+            Budget.user_id == user_id
+        ).group_by(Budget.id, Budget.category, Budget.amount).order_by(Budget.id).all()
         
-        for budget in budgets:
-            expenses = self.db.query(BudgetExpense).filter(
-                BudgetExpense.budget_id == budget.id,
-                BudgetExpense.date >= start_date,
-                BudgetExpense.date <= end_date
-            ).all()
-            
-            category_spending[budget.category] = {
-                "total_spent": sum(expense.amount for expense in expenses),
-                "budget_amount": budget.amount
+        return {
+            category: {
+                "total_spent": total_spent,
+                "budget_amount": budget_amount
             }
-        
-        return category_spending
+            for category, budget_amount, total_spent in rows
+        }
 
-    def _check_and_create_alerts(self, budget_id: int) -> None:
-        """Check and create budget alerts based on spending patterns."""
-        budget = self.db.query(Budget).get(budget_id)
-        if not budget:
+    def _check_and_create_alerts(self, budget_id: int, total_spent: float, budget_amount: float,
+                                 category: BudgetCategory, expense_amount: float = 0) -> None:
+        """Create budget alerts when this expense pushes spending across a threshold."""
+        if budget_amount <= 0:
             return
+        percentage_used = (total_spent / budget_amount) * 100
+        previous_percentage = ((total_spent - expense_amount) / budget_amount) * 100
 
-        total_spent = sum(expense.amount for expense in budget.expenses)
-        percentage_used = (total_spent / budget.amount) * 100 if budget.amount > 0 else 0
+        # Fire on the crossing only, not on every expense above the line
+        if previous_percentage < OVERSPENT_PERCENT <= percentage_used:
+            alert_type = AlertType.OVERSPENT
+            message = f"You have exceeded your {category} budget by {(percentage_used - 100):.1f}%"
+        elif previous_percentage < APPROACHING_LIMIT_PERCENT <= percentage_used < OVERSPENT_PERCENT:
+            alert_type = AlertType.APPROACHING_LIMIT
+            message = f"You have used {percentage_used:.1f}% of your {category} budget"
+        else:
+            return
 
-        # Check for approaching limit (80% of budget)
-        if percentage_used >= 80 and percentage_used < 100:
-            self._create_alert(
-                budget_id,
-                AlertType.APPROACHING_LIMIT,
-                f"You have used {percentage_used:.1f}% of your {budget.category} budget",
-                percentage_used
-            )
+        if _alert_recently_fired(budget_id, alert_type):
+            return
 
-        # Check for overspent
-        if percentage_used >= 100:
-            self._create_alert(
-                budget_id,
-                AlertType.OVERSPENT,
-                f"You have exceeded your {budget.category} budget by {(percentage_used - 100):.1f}%",
-                percentage_used
+        # One lookup covers both spending alert types
+        active_types = {
+            active_type for (active_type,) in self.db.query(BudgetAlert.type).filter(
+                BudgetAlert.budget_id == budget_id,
+                BudgetAlert.type.in_((AlertType.APPROACHING_LIMIT, AlertType.OVERSPENT)),
+                BudgetAlert.status == AlertStatus.ACTIVE
             )
+        }
+        if alert_type not in active_types:
+            self._create_alert(budget_id, alert_type, message, percentage_used)
+        _mark_alert_fired(budget_id, alert_type)
 
     def _create_alert(self, budget_id: int, alert_type: AlertType, message: str, threshold_percentage: float) -> None:
-        """Create a budget alert if one doesn't already exist."""
-        existing_alert = self.db.query(BudgetAlert).filter(
-            BudgetAlert.budget_id == budget_id,
-            BudgetAlert.type == alert_type,
-            BudgetAlert.status == AlertStatus.ACTIVE
-        ).first()
-
-        if not existing_alert:
-            alert = BudgetAlert(
-                budget_id=budget_id,
-                type=alert_type,
-                message=message,
-                threshold_percentage=threshold_percentage
-            )
-            self.db.add(alert)
-            self.db.commit()
+        """Stage a budget alert; the caller owns the commit."""
+        alert = BudgetAlert(
+            budget_id=budget_id,
+            type=alert_type,
+            message=message,
+            threshold_percentage=threshold_percentage
+        )
+        self.db.add(alert)
+        self.db.flush()
 
     def get_active_alerts(self, user_id: int) -> List[BudgetAlert]:
         """Get all active alerts for a user's budgets."""
-        return self.db.query(BudgetAlert).join(Budget).filter(
+        # Populate alert.budget from the join so callers don't lazy-load it per alert
+        return self.db.query(BudgetAlert).join(BudgetAlert.budget).options(
+            contains_eager(BudgetAlert.budget)
+        ).filter(
             Budget.user_id == user_id,
             BudgetAlert.status == AlertStatus.ACTIVE
         ).all()
@@ -1,15 +1,49 @@
 from typing import Any, Dict, Optional
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives.asymmetric import rsa, padding, x25519
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 import base64
+import hashlib
+import hmac
+import mmap
 import os
 import json
+import secrets
 from app.core.config import settings
 
+# New hashes use scrypt; its cost parameters are stored alongside each hash
+_SCRYPT_PREFIX = "scrypt$"
+_SCRYPT_N = 2 ** 14
+_SCRYPT_R = 8
+_SCRYPT_P = 1
+_HASH_LENGTH = 32
+
+# Legacy PBKDF2 hashes carry no prefix; kept only to verify them
+_PBKDF2_DIGEST = "sha256"
+_PBKDF2_ITERATIONS = 100_000
+
+def _scrypt(data: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(data.encode(), salt=salt, n=n, r=r, p=p, dklen=_HASH_LENGTH)
+
+def _pbkdf2(data: str, salt: bytes) -> bytes:
+    # One call into OpenSSL's PKCS5_PBKDF2_HMAC
+    return hashlib.pbkdf2_hmac(_PBKDF2_DIGEST, data.encode(), salt, _PBKDF2_ITERATIONS, _HASH_LENGTH)
+
+_GCM_IV_SIZE = 12
+_GCM_TAG_SIZE = 16
+# update_into may emit up to one block more than it is given
+_AES_BLOCK_SLACK = 15
+
+_X25519_KEY_SIZE = 32
+_HYBRID_INFO = b"banking-system/x25519-aes256gcm"
+
+_SHA256 = hashes.SHA256()
+_OAEP = padding.OAEP(mgf=padding.MGF1(algorithm=_SHA256), algorithm=_SHA256, label=None)
+
 class EncryptionService:
     def __init__(self):
         self.master_key = base64.b64decode(settings.ENCRYPTION_MASTER_KEY)
@@ -37,32 +71,38 @@ class EncryptionService:
 
     def hash_sensitive_data(self, data: str, salt: Optional[bytes] = None) -> Dict[str, str]:
         """
-        One-way hash sensitive data using PBKDF2.
+        One-way hash sensitive data using scrypt.
         Used for data that doesn't need to be decrypted (e.g., passwords).
         """
         if not salt:
             salt = os.urandom(16)
             
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000
-        )
-        
-        key = base64.b64encode(kdf.derive(data.encode())).decode()
+        derived = _scrypt(data, salt, _SCRYPT_N, _SCRYPT_R, _SCRYPT_P)
+        key = base64.b64encode(derived).decode()
         return {
-            "hash": key,
+            "hash": f"{_SCRYPT_PREFIX}{_SCRYPT_N}${_SCRYPT_R}${_SCRYPT_P}${key}",
             "salt": base64.b64encode(salt).decode()
         }
 
     def verify_hashed_data(self, data: str, stored_hash: str, salt: str) -> bool:
         """
-        Verify hashed data against stored hash.
+        Verify hashed data against stored hash, scrypt or legacy PBKDF2.
         """
         salt_bytes = base64.b64decode(salt)
-        new_hash = self.hash_sensitive_data(data, salt_bytes)
-        return new_hash["hash"] == stored_hash
+        if stored_hash.startswith(_SCRYPT_PREFIX):
+            n, r, p, key = stored_hash[len(_SCRYPT_PREFIX):].split("$")
+            derived = _scrypt(data, salt_bytes, int(n), int(r), int(p))
+        else:
+            key = stored_hash
+            derived = _pbkdf2(data, salt_bytes)
+        return hmac.compare_digest(base64.b64encode(derived).decode(), key)
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        """
+        Whether a stored hash predates the current scrypt parameters and should be
+        replaced with hash_sensitive_data on the next successful verify.
+        """
+        return not stored_hash.startswith(f"{_SCRYPT_PREFIX}{_SCRYPT_N}${_SCRYPT_R}${_SCRYPT_P}$")
 
     def generate_key_pair(self) -> Dict[str, str]:
         """
@@ -92,51 +132,94 @@ class EncryptionService:
             "public_key": public_pem.decode()
         }
 
+    def generate_x25519_key_pair(self) -> Dict[str, str]:
+        """
+        Generate an X25519 key pair for hybrid asymmetric encryption.
+        Encryption-only; use generate_key_pair when signatures are needed.
+        """
+        private_key = x25519.X25519PrivateKey.generate()
+        
+        private_pem = private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+        
+        public_pem = private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        
+        return {
+            "private_key": private_pem.decode(),
+            "public_key": public_pem.decode()
+        }
+
     def asymmetric_encrypt(self, data: str, public_key_pem: str) -> str:
         """
-        Encrypt data using RSA public key.
+        Encrypt data for the holder of a public key.
+        X25519 keys use ephemeral ECDH + HKDF-SHA256 + AES-256-GCM, producing
+        ephemeral public key (32) | nonce (12) | ciphertext | tag (16), with no size limit.
+        RSA keys fall back to OAEP for existing key pairs.
         Used for secure data exchange between parties.
         """
         public_key = serialization.load_pem_public_key(public_key_pem.encode())
         
-        encrypted_data = public_key.encrypt(
-            data.encode(),
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
+        if isinstance(public_key, x25519.X25519PublicKey):
+            ephemeral_key = x25519.X25519PrivateKey.generate()
+            ephemeral_public = ephemeral_key.public_key().public_bytes_raw()
+            key = self._hybrid_key(ephemeral_key.exchange(public_key), ephemeral_public, public_key.public_bytes_raw())
+            nonce = os.urandom(_GCM_IV_SIZE)
+            encrypted_data = ephemeral_public + nonce + AESGCM(key).encrypt(nonce, data.encode(), None)
+        else:
+            encrypted_data = public_key.encrypt(
+                data.encode(),
+                _OAEP
             )
-        )
         
         return base64.b64encode(encrypted_data).decode()
 
     def asymmetric_decrypt(self, encrypted_data: str, private_key_pem: str) -> str:
         """
-        Decrypt data using RSA private key.
+        Decrypt data using an X25519 or RSA private key.
         """
         private_key = serialization.load_pem_private_key(
             private_key_pem.encode(),
             password=None
         )
+        payload = base64.b64decode(encrypted_data)
         
-        decrypted_data = private_key.decrypt(
-            base64.b64decode(encrypted_data),
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
+        if isinstance(private_key, x25519.X25519PrivateKey):
+            ephemeral_public = payload[:_X25519_KEY_SIZE]
+            nonce = payload[_X25519_KEY_SIZE:_X25519_KEY_SIZE + _GCM_IV_SIZE]
+            shared_secret = private_key.exchange(x25519.X25519PublicKey.from_public_bytes(ephemeral_public))
+            key = self._hybrid_key(shared_secret, ephemeral_public, private_key.public_key().public_bytes_raw())
+            decrypted_data = AESGCM(key).decrypt(nonce, payload[_X25519_KEY_SIZE + _GCM_IV_SIZE:], None)
+        else:
+            decrypted_data = private_key.decrypt(
+                payload,
+                _OAEP
             )
-        )
         
         return decrypted_data.decode()
 
+    @staticmethod
+    def _hybrid_key(shared_secret: bytes, ephemeral_public: bytes, recipient_public: bytes) -> bytes:
+        """AES-256 key bound to both parties' public keys."""
+        return HKDF(
+            algorithm=_SHA256,
+            length=32,
+            salt=None,
+            info=_HYBRID_INFO + ephemeral_public + recipient_public
+        ).derive(shared_secret)
+
     def encrypt_file(self, file_path: str, output_path: str) -> None:
         """
         Encrypt a file using AES-256-GCM.
         Used for secure file storage.
         """
         key = os.urandom(32)
-        iv = os.urandom(12)
+        iv = os.urandom(_GCM_IV_SIZE)
         
         cipher = Cipher(
             algorithms.AES(key),
@@ -149,12 +232,10 @@ class EncryptionService:
             # Write IV at the beginning of the file
             f_out.write(iv)
             
-            # Encrypt and write the file content
-            while True:
-                chunk = f_in.read(64 * 1024)
-                if not chunk:
-                    break
-                f_out.write(encryptor.update(chunk))
+            # Encrypt straight from the mapped input into one reused output buffer
+            if os.fstat(f_in.fileno()).st_size:
+                with mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                    self._gcm_stream(encryptor, source, 0, len(source), f_out)
             
             # Write the tag at the end
             f_out.write(encryptor.finalize())
@@ -166,44 +247,43 @@ class EncryptionService:
     def decrypt_file(self, encrypted_file: str, output_path: str, key: str) -> None:
         """
         Decrypt a file using AES-256-GCM.
+        The file layout is IV (12 bytes) | ciphertext | tag (16 bytes).
         """
         key_bytes = base64.b64decode(key)
         
-        with open(encrypted_file, 'rb') as f_in:
-            # Read the IV from the beginning of the file
-            iv = f_in.read(12)
+        with open(encrypted_file, 'rb') as f_in, \
+                mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            iv = source[:_GCM_IV_SIZE]
+            tag = source[-_GCM_TAG_SIZE:]
             
-            # Create cipher
-            cipher = Cipher(
+            decryptor = Cipher(
                 algorithms.AES(key_bytes),
                 modes.GCM(iv),
-            )
-            
-            decryptor = cipher.decryptor()
-            
-            # Get file size and calculate tag position
-            f_in.seek(0, 2)
-            file_size = f_in.tell()
-            tag_position = file_size - 16
-            
-            # Read encrypted data
-            f_in.seek(12)
-            encrypted_data = f_in.read(tag_position - 12)
-            
-            # Read tag
-            tag = f_in.read(16)
-            
-            # Set tag
+            ).decryptor()
             decryptor.authenticate_additional_data(b"")
             
-            # Decrypt and write to output file
-            with open(output_path, 'wb') as f_out:
-                decrypted_data = decryptor.update(encrypted_data) + decryptor.finalize_with_tag(tag)
-                f_out.write(decrypted_data)
+            # Plaintext is written as it streams, so drop it if the tag doesn't verify
+            try:
+                with open(output_path, 'wb') as f_out:
+                    self._gcm_stream(decryptor, source, _GCM_IV_SIZE, len(source) - _GCM_TAG_SIZE, f_out)
+                    f_out.write(decryptor.finalize_with_tag(tag))
+            except Exception:
+                os.remove(output_path)
+                raise
+
+    def _gcm_stream(self, context, source: mmap.mmap, start: int, end: int, f_out) -> None:
+        """Feed source[start:end] through an AES-GCM context in FILE_CRYPTO_BUFFER_SIZE windows."""
+        size = settings.FILE_CRYPTO_BUFFER_SIZE
+        out = bytearray(size + _AES_BLOCK_SLACK)
+        with memoryview(source) as view, memoryview(out) as out_view:
+            for offset in range(start, end, size):
+                written = context.update_into(view[offset:min(offset + size, end)], out)
+                f_out.write(out_view[:written])
 
     def secure_random_string(self, length: int = 32) -> str:
         """
         Generate a secure random string.
         Used for generating secure tokens, keys, etc.
         """
-        return base64.b64encode(os.urandom(length)).decode()[:length]
+        # Draw only the bytes needed for `length` URL-safe base64 characters
+        return secrets.token_urlsafe((length * 3 + 3) // 4)[:length]
@@ -1,13 +1,30 @@
-from typing import Dict, Optional, List, Any
+from collections import OrderedDict
+from typing import Dict, Optional, Any
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, cast, Float, event
 from app.models.transaction import Transaction, TransactionType, TransactionStatus
 from app.models.user import User
 from app.models.auth import AuthDevice
 import json
+import threading
+import time
 from decimal import Decimal
 
+# Risk profiles are reused briefly across dashboard reads and dropped when the user transacts
+RISK_PROFILE_TTL = 60
+_RISK_PROFILE_CACHE_SIZE = 10_000
+_risk_profile_cache: "OrderedDict[int, tuple]" = OrderedDict()
+_risk_profile_lock = threading.Lock()
+
+def invalidate_risk_profile(user_id: int) -> None:
+    with _risk_profile_lock:
+        _risk_profile_cache.pop(user_id, None)
+
+@event.listens_for(Transaction, "after_insert")
+def _drop_risk_profile_on_insert(mapper, connection, target) -> None:
+    invalidate_risk_profile(target.user_id)
+
 class FraudDetectionService:
     def __init__(self, db: Session):
         self.db = db
@@ -26,42 +43,63 @@ class FraudDetectionService:
         risk_factors = []
         risk_score = 0.0
         
-        # Get user's transaction history
-        recent_transactions = self.db.query(Transaction).filter(
+        # Scoring is statistics, not bookkeeping: work in floats from here on
+        amount = float(amount)
+        
+        # Summarize the user's last 30 days in one round trip, as doubles
+        now = datetime.utcnow()
+        same_type = Transaction.type == transaction_type
+        amount_f = cast(Transaction.amount, Float)
+        history = self.db.query(
+            func.count(Transaction.id).label("total_count"),
+            func.avg(amount_f).label("avg_amount"),
+            func.max(amount_f).label("max_amount"),
+            func.stddev_samp(amount_f).label("std_dev"),
+            func.count(Transaction.id).filter(
+                Transaction.created_at >= now - timedelta(hours=1)
+            ).label("count_hour"),
+            func.count(Transaction.id).filter(
+                Transaction.created_at >= now - timedelta(days=7)
+            ).label("count_week"),
+            func.count(Transaction.id).filter(same_type).label("count_same_type"),
+            func.count(Transaction.id).filter(
+                same_type, Transaction.created_at >= now - timedelta(minutes=5)
+            ).label("count_same_type_recent")
+        ).filter(
             Transaction.user_id == user_id,
-            Transaction.created_at >= datetime.utcnow() - timedelta(days=30)
-        ).all()
+            Transaction.created_at >= now - timedelta(days=30)
+        ).one()
         
         # 1. Amount Analysis (30% of total score)
-        risk_score += self._analyze_amount(amount, recent_transactions) * 0.3
+        risk_score += self._analyze_amount(amount, history) * 0.3
         
         # 2. Frequency Analysis (20% of total score)
-        risk_score += self._analyze_frequency(user_id) * 0.2
+        risk_score += self._analyze_frequency(history.count_hour, history.count_week) * 0.2
         
         # 3. Device Analysis (25% of total score)
         risk_score += self._analyze_device(user_id, device_info) * 0.25
         
         # 4. Pattern Analysis (25% of total score)
         risk_score += self._analyze_patterns(
-            user_id, amount, transaction_type, recent_transactions
+            amount, history.total_count, history.count_same_type, history.count_same_type_recent
         ) * 0.25
         
         return min(risk_score, 1.0)
 
-    def _analyze_amount(self, amount: Decimal, history: List[Transaction]) -> float:
-        """Analyze transaction amount against user history."""
-        if not history:
+    def _analyze_amount(self, amount: float, stats: Any) -> float:
+        """
+        Analyze transaction amount against user history.
+        `stats` carries the SQL aggregates total_count, avg_amount, max_amount and std_dev.
+        """
+        if not stats.total_count:
             return 0.5  # Moderate risk for new users
         
-        avg_amount = sum(t.amount for t in history) / len(history)
-        max_amount = max(t.amount for t in history)
+        avg_amount = stats.avg_amount
+        max_amount = stats.max_amount
+        std_dev = stats.std_dev or 0  # NULL for a single transaction
         
         # Calculate how many standard deviations from mean
-        if len(history) > 1:
-            std_dev = (sum((t.amount - avg_amount) ** 2 for t in history) / (len(history) - 1)) ** 0.5
-            z_score = (amount - avg_amount) / std_dev if std_dev > 0 else 0
-        else:
-            z_score = 0
+        z_score = (amount - avg_amount) / std_dev if std_dev > 0 else 0
         
         # Risk increases with amount deviation
         if amount > max_amount:
@@ -71,19 +109,10 @@ class FraudDetectionService:
         
         return 0.0
 
-    def _analyze_frequency(self, user_id: int) -> float:
+    def _analyze_frequency(self, recent_count: int, week_count: int) -> float:
         """Analyze transaction frequency."""
-        # Count transactions in the last hour
-        recent_count = self.db.query(func.count(Transaction.id)).filter(
-            Transaction.user_id == user_id,
-            Transaction.created_at >= datetime.utcnow() - timedelta(hours=1)
-        ).scalar()
-        
-        # Get user's typical hourly frequency
-        typical_count = self.db.query(func.count(Transaction.id)).filter(
-            Transaction.user_id == user_id,
-            Transaction.created_at >= datetime.utcnow() - timedelta(days=7)
-        ).scalar() / (24 * 7)  # Average per hour
+        # Typical hourly frequency over the last week
+        typical_count = week_count / (24 * 7)
         
         if typical_count == 0:
             return 0.5 if recent_count > 3 else 0.0
@@ -114,31 +143,20 @@ class FraudDetectionService:
 
     def _analyze_patterns(
         self,
-        user_id: int,
-        amount: Decimal,
-        transaction_type: TransactionType,
-        history: List[Transaction]
+        amount: float,
+        total_count: int,
+        same_type_count: int,
+        recent_similar_count: int
     ) -> float:
         """Analyze transaction patterns."""
         risk_score = 0.0
         
         # Check for rapid successive transactions
-        recent_similar = [
-            t for t in history
-            if t.type == transaction_type
-            and t.created_at >= datetime.utcnow() - timedelta(minutes=5)
-        ]
-        
-        if len(recent_similar) > 2:
+        if recent_similar_count > 2:
             risk_score += 0.3
         
         # Check for unusual transaction type frequency
-        type_frequency = {}
-        for t in history:
-            type_frequency[t.type] = type_frequency.get(t.type, 0) + 1
-        
-        total_transactions = len(history) if history else 1
-        type_ratio = type_frequency.get(transaction_type, 0) / total_transactions
+        type_ratio = same_type_count / (total_count or 1)
         
         if type_ratio < 0.1:  # Unusual transaction type
             risk_score += 0.2
@@ -150,28 +168,40 @@ class FraudDetectionService:
         return min(risk_score, 1.0)
 
     async def get_user_risk_profile(self, user_id: int) -> Dict[str, Any]:
-        """Get a user's risk profile based on their transaction history."""
+        """Get a user's risk profile based on their transaction history, cached for RISK_PROFILE_TTL seconds."""
+        now = time.monotonic()
+        with _risk_profile_lock:
+            entry = _risk_profile_cache.get(user_id)
+            if entry and entry[0] > now:
+                return dict(entry[1])
+        
+        profile = self._compute_risk_profile(user_id)
+        with _risk_profile_lock:
+            _risk_profile_cache[user_id] = (now + RISK_PROFILE_TTL, profile)
+            _risk_profile_cache.move_to_end(user_id)
+            while len(_risk_profile_cache) > _RISK_PROFILE_CACHE_SIZE:
+                _risk_profile_cache.popitem(last=False)
+        return dict(profile)
+
+    def _compute_risk_profile(self, user_id: int) -> Dict[str, Any]:
+        """Build a user's risk profile from the last 90 days of transactions."""
         user = self.db.query(User).filter(User.id == user_id).first()
         if not user:
             return {"risk_level": "unknown"}
         
-        # Get transaction history
-        transactions = self.db.query(Transaction).filter(
+        # Count the history's totals, failures and high-risk rows in one pass
+        total_transactions, failed_transactions, high_risk_transactions = self.db.query(
+            func.count(Transaction.id),
+            func.count(Transaction.id).filter(Transaction.status == TransactionStatus.FAILED),
+            func.count(Transaction.id).filter(Transaction.risk_score > 0.7)
+        ).filter(
             Transaction.user_id == user_id,
             Transaction.created_at >= datetime.utcnow() - timedelta(days=90)
-        ).all()
+        ).one()
         
-        if not transactions:
+        if not total_transactions:
             return {"risk_level": "new_user"}
         
-        # Calculate risk metrics
-        total_transactions = len(transactions)
-        failed_transactions = len([t for t in transactions if t.status == TransactionStatus.FAILED])
-        high_risk_transactions = len([
-            t for t in transactions
-            if getattr(t, "risk_score", 0) > 0.7
-        ])
-        
         # Calculate risk level
         risk_ratio = (failed_transactions + high_risk_transactions) / total_transactions
         
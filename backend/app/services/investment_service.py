@@ -1,7 +1,13 @@
-from typing import List, Optional, Dict
+from collections import OrderedDict
+from typing import List, Optional, Dict, Set
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+import asyncio
+import logging
+import threading
+import time
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import func, update, select, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import yfinance as yf
 import pandas as pd
 import numpy as np
@@ -14,6 +20,78 @@ from app.schemas.investment import (
     TransactionCreate, AlertCreate
 )
 from app.core.exceptions import NotFoundException, ValidationError
+from app.db.session import SessionLocal
+from fastapi import BackgroundTasks
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Allocation is reported in AssetType declaration order
+_ASSET_INDEX = {asset_type: index for index, asset_type in enumerate(AssetType)}
+
+# SQL mirrors of Holding.market_value / Holding.gain_loss (a zero price counts as unpriced)
+_PRICED = func.nullif(Holding.current_price, 0)
+_MARKET_VALUE = Holding.quantity * func.coalesce(_PRICED, Holding.average_price)
+_GAIN_LOSS = func.coalesce((_PRICED - Holding.average_price) * Holding.quantity, 0)
+
+# Quoted prices are shared process-wide for a minute, so portfolios holding the same
+# symbols and back-to-back refreshes skip the network
+PRICE_CACHE_TTL = 60
+_PRICE_CACHE_SIZE = 4096
+_price_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_price_cache_lock = threading.Lock()
+
+def _cached_prices(symbols: List[str]) -> Dict[str, float]:
+    now = time.monotonic()
+    prices = {}
+    with _price_cache_lock:
+        for symbol in symbols:
+            entry = _price_cache.get(symbol)
+            if entry and entry[0] > now:
+                prices[symbol] = entry[1]
+    return prices
+
+def _cache_prices(prices: Dict[str, float]) -> None:
+    expires_at = time.monotonic() + PRICE_CACHE_TTL
+    with _price_cache_lock:
+        for symbol, price in prices.items():
+            _price_cache[symbol] = (expires_at, price)
+            _price_cache.move_to_end(symbol)
+        while len(_price_cache) > _PRICE_CACHE_SIZE:
+            _price_cache.popitem(last=False)
+
+def _download_prices(symbols: List[str]) -> Dict[str, float]:
+    """Latest close for each symbol from one batched yfinance download."""
+    data = yf.download(symbols, period="1d", group_by="ticker", progress=False, threads=True)
+    prices = {}
+    for symbol in symbols:
+        try:
+            closes = data[symbol]["Close"] if isinstance(data.columns, pd.MultiIndex) else data["Close"]
+            closes = closes.dropna()
+        except KeyError:
+            continue
+        if not closes.empty:
+            prices[symbol] = float(closes.iloc[-1])
+    return prices
+
+# Trades within this window share one performance recompute
+PERFORMANCE_DEBOUNCE_SECONDS = 5
+_pending_performance: Set[int] = set()
+_pending_performance_lock = threading.Lock()
+
+def _refresh_portfolio_performance(portfolio_id: int) -> None:
+    db = SessionLocal()
+    try:
+        InvestmentService(db)._update_portfolio_performance(portfolio_id)
+    finally:
+        db.close()
+
+async def _debounced_performance_update(portfolio_id: int) -> None:
+    await asyncio.sleep(PERFORMANCE_DEBOUNCE_SECONDS)
+    # Release the slot first so a trade landing mid-recompute schedules another pass
+    with _pending_performance_lock:
+        _pending_performance.discard(portfolio_id)
+    await run_in_threadpool(_refresh_portfolio_performance, portfolio_id)
 
 class InvestmentService:
     def __init__(self, db: Session):
@@ -45,8 +123,16 @@ class InvestmentService:
         """Get all portfolios for a user."""
         return self.db.query(Portfolio).filter(Portfolio.user_id == user_id).all()
 
-    def add_transaction(self, portfolio_id: int, transaction_data: TransactionCreate) -> InvestmentTransaction:
-        """Add a new investment transaction and update holdings."""
+    def add_transaction(
+        self,
+        portfolio_id: int,
+        transaction_data: TransactionCreate,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> InvestmentTransaction:
+        """
+        Add a new investment transaction and update holdings.
+        With background_tasks the performance snapshot is refreshed after the response, debounced per portfolio.
+        """
         # Create transaction
         transaction = InvestmentTransaction(
             portfolio_id=portfolio_id,
@@ -60,8 +146,10 @@ class InvestmentService:
             notes=transaction_data.notes
         )
 
-        # Update or create holding
-        holding = self.db.query(Holding).filter(
+        # Update or create holding; only the position columns are needed
+        holding = self.db.query(Holding).options(
+            load_only(Holding.id, Holding.quantity, Holding.average_price)
+        ).filter(
             Holding.portfolio_id == portfolio_id,
             Holding.symbol == transaction_data.symbol
         ).first()
@@ -89,58 +177,113 @@ class InvestmentService:
                     if holding.quantity <= 0:
                         self.db.delete(holding)
                     
+        # Cash flows move the running cost basis in the same transaction
+        if transaction_data.transaction_type in (TransactionType.DEPOSIT, TransactionType.WITHDRAWAL):
+            sign = 1 if transaction_data.transaction_type == TransactionType.DEPOSIT else -1
+            self.db.execute(
+                update(Portfolio)
+                .where(Portfolio.id == portfolio_id)
+                .values(cost_basis=Portfolio.cost_basis + sign * transaction.total_amount)
+                .execution_options(synchronize_session=False)
+            )
+
         transaction.holding_id = holding.id if holding else None
         self.db.add(transaction)
         self.db.commit()
         self.db.refresh(transaction)
         
         # Update portfolio performance
-        self._update_portfolio_performance(portfolio_id)
+        if background_tasks is None:
+            self._update_portfolio_performance(portfolio_id)
+        else:
+            self._schedule_performance_update(portfolio_id, background_tasks)
         return transaction
 
+    def reconcile_cost_basis(self, portfolio_id: Optional[int] = None) -> int:
+        """
+        Recompute cost bases from deposit and withdrawal history. Run once to backfill
+        portfolios that predate the column; safe to rerun as a periodic check.
+        """
+        net_cash_flow = select(
+            func.coalesce(func.sum(case(
+                (InvestmentTransaction.transaction_type == TransactionType.WITHDRAWAL,
+                 -InvestmentTransaction.total_amount),
+                else_=InvestmentTransaction.total_amount
+            )), 0)
+        ).where(
+            InvestmentTransaction.portfolio_id == Portfolio.id,
+            InvestmentTransaction.transaction_type.in_([TransactionType.DEPOSIT, TransactionType.WITHDRAWAL])
+        ).scalar_subquery()
+        stmt = update(Portfolio).values(cost_basis=net_cash_flow)
+        if portfolio_id is not None:
+            stmt = stmt.where(Portfolio.id == portfolio_id)
+        result = self.db.execute(stmt.execution_options(synchronize_session=False))
+        self.db.commit()
+        return result.rowcount
+
+    def _schedule_performance_update(self, portfolio_id: int, background_tasks: BackgroundTasks) -> None:
+        """Queue one deferred recompute per portfolio per debounce window."""
+        with _pending_performance_lock:
+            if portfolio_id in _pending_performance:
+                return
+            _pending_performance.add(portfolio_id)
+        background_tasks.add_task(_debounced_performance_update, portfolio_id)
+
     def update_prices(self, portfolio_id: int) -> None:
         """Update current prices for all holdings in a portfolio."""
         holdings = self.db.query(Holding).filter(Holding.portfolio_id == portfolio_id).all()
-        
-        for holding in holdings:
-            if holding.asset_type in [AssetType.STOCK, AssetType.ETF]:
-                try:
-                    ticker = yf.Ticker(holding.symbol)
-                    current_price = ticker.info.get('regularMarketPrice')
-                    if current_price:
-                        holding.current_price = current_price
-                        holding.last_updated = datetime.utcnow()
-                except Exception as e:
-                    print(f"Error updating price for {holding.symbol}: {str(e)}")
+        quoted = [h for h in holdings if h.asset_type in (AssetType.STOCK, AssetType.ETF)]
+        symbols = sorted({h.symbol for h in quoted})
+
+        prices = _cached_prices(symbols)
+        missing = [symbol for symbol in symbols if symbol not in prices]
+        if missing:
+            try:
+                fetched = _download_prices(missing)
+                _cache_prices(fetched)
+                prices.update(fetched)
+            except Exception:
+                logger.exception("Error updating prices for %s", ", ".join(missing))
+
+        now = datetime.utcnow()
+        price_updates = [
+            (holding.id, prices[holding.symbol], now)
+            for holding in quoted
+            if prices.get(holding.symbol)
+        ]
 
+        Holding.bulk_update_prices(self.db, price_updates)
         self.db.commit()
         self._update_portfolio_performance(portfolio_id)
         self._check_alerts(portfolio_id)
 
     def get_portfolio_summary(self, portfolio_id: int) -> Dict:
         """Get a summary of portfolio performance and allocation."""
-        holdings = self.db.query(Holding).filter(Holding.portfolio_id == portfolio_id).all()
+        # One row per asset type, summed in the database
+        rows = self.db.query(
+            Holding.asset_type,
+            func.sum(_MARKET_VALUE),
+            func.sum(_GAIN_LOSS),
+            func.max(Holding.last_updated)
+        ).filter(
+            Holding.portfolio_id == portfolio_id
+        ).group_by(Holding.asset_type).all()
+        rows.sort(key=lambda row: _ASSET_INDEX[row[0]])
         
-        total_value = sum(holding.market_value for holding in holdings)
-        total_gain_loss = sum(holding.gain_loss for holding in holdings)
+        total_value = sum(value for _, value, _, _ in rows)
+        total_gain_loss = sum(gain_loss for _, _, gain_loss, _ in rows)
+        last_updated = max((updated for _, _, _, updated in rows if updated), default=None)
         
-        # Calculate allocation by asset type
-        allocation = {}
-        for holding in holdings:
-            if holding.asset_type not in allocation:
-                allocation[holding.asset_type] = 0
-            allocation[holding.asset_type] += holding.market_value
-            
         # Convert to percentages
-        if total_value > 0:
-            allocation = {k: (v/total_value)*100 for k, v in allocation.items()}
+        scale = 100 / total_value if total_value > 0 else 1
+        allocation = {asset_type: value * scale for asset_type, value, _, _ in rows}
 
         return {
             "total_value": total_value,
             "total_gain_loss": total_gain_loss,
             "gain_loss_percentage": (total_gain_loss / (total_value - total_gain_loss)) * 100 if total_value > total_gain_loss else 0,
             "allocation": allocation,
-            "last_updated": max(holding.last_updated for holding in holdings) if holdings else None
+            "last_updated": last_updated
         }
 
     def get_performance_history(self, portfolio_id: int, timeframe: str = "1Y") -> List[Dict]:
@@ -202,24 +345,34 @@ class InvestmentService:
             daily_return = ((total_value - prev_performance.total_value) / prev_performance.total_value) * 100
 
         # Calculate total return
-        initial_value = self.db.query(func.sum(InvestmentTransaction.total_amount)).filter(
-            InvestmentTransaction.portfolio_id == portfolio_id,
-            InvestmentTransaction.transaction_type.in_([TransactionType.DEPOSIT, TransactionType.WITHDRAWAL])
-        ).scalar() or 0
+        initial_value = float(self.db.query(Portfolio.cost_basis).filter(
+            Portfolio.id == portfolio_id
+        ).scalar() or 0)
 
         total_return = ((total_value - initial_value) / initial_value) * 100 if initial_value > 0 else 0
 
-        # Save performance data
-        performance = PortfolioPerformance(
-            portfolio_id=portfolio_id,
-            date=datetime.utcnow().date(),
-            total_value=total_value,
-            daily_return=daily_return,
-            total_return=total_return
+        # Save performance data, replacing today's row if there already is one
+        metrics = {
+            "total_value": total_value,
+            "daily_return": daily_return,
+            "total_return": total_return
+        }
+        self.db.execute(
+            pg_insert(PortfolioPerformance)
+            .values(portfolio_id=portfolio_id, date=datetime.utcnow().date(), **metrics)
+            .on_conflict_do_update(
+                index_elements=[PortfolioPerformance.portfolio_id, PortfolioPerformance.date],
+                set_={**metrics, "updated_at": datetime.utcnow()}
+            )
         )
-        self.db.add(performance)
         self.db.commit()
 
+    def _compute_total_value(self, portfolio_id: int) -> float:
+        """Portfolio market value summed in the database."""
+        return self.db.query(func.coalesce(func.sum(_MARKET_VALUE), 0)).filter(
+            Holding.portfolio_id == portfolio_id
+        ).scalar()
+
     def _check_alerts(self, portfolio_id: int) -> None:
         """Check and trigger portfolio alerts."""
         alerts = self.db.query(PortfolioAlert).filter(
@@ -227,9 +380,26 @@ class InvestmentService:
             PortfolioAlert.is_active == True
         ).all()
 
+        # Everything the alerts compare against is loaded once, up front
+        holding_ids = {alert.holding_id for alert in alerts if alert.holding_id}
+        holdings = {
+            holding.id: holding
+            for holding in self.db.query(Holding).filter(Holding.id.in_(holding_ids))
+        } if holding_ids else {}
+
+        portfolio_value = prev_performance = None
+        if any(not alert.holding_id for alert in alerts):
+            portfolio_value = self._compute_total_value(portfolio_id)
+            # Get previous day's value
+            yesterday = datetime.utcnow().date() - timedelta(days=1)
+            prev_performance = self.db.query(PortfolioPerformance).filter(
+                PortfolioPerformance.portfolio_id == portfolio_id,
+                PortfolioPerformance.date == yesterday
+            ).first()
+
         for alert in alerts:
             if alert.holding_id:
-                holding = self.db.query(Holding).get(alert.holding_id)
+                holding = holdings.get(alert.holding_id)
                 if not holding:
                     continue
 
@@ -245,19 +415,10 @@ class InvestmentService:
                         alert.is_active = False
 
             else:  # Portfolio-wide alert
-                portfolio_value = self.get_portfolio_summary(portfolio_id)["total_value"]
-                if alert.alert_type == "portfolio_change":
-                    # Get previous day's value
-                    yesterday = datetime.utcnow().date() - timedelta(days=1)
-                    prev_performance = self.db.query(PortfolioPerformance).filter(
-                        PortfolioPerformance.portfolio_id == portfolio_id,
-                        PortfolioPerformance.date == yesterday
-                    ).first()
-
-                    if prev_performance:
-                        change = ((portfolio_value - prev_performance.total_value) / prev_performance.total_value) * 100
-                        if abs(change) >= alert.threshold:
-                            alert.triggered_at = datetime.utcnow()
-                            alert.is_active = False
+                if alert.alert_type == "portfolio_change" and prev_performance:
+                    change = ((portfolio_value - prev_performance.total_value) / prev_performance.total_value) * 100
+                    if abs(change) >= alert.threshold:
+                        alert.triggered_at = datetime.utcnow()
+                        alert.is_active = False
 
         self.db.commit()
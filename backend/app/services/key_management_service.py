@@ -1,11 +1,49 @@
+from collections import OrderedDict
+import base64
+import os
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict
-from sqlalchemy.orm import Session
+import threading
+import time
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from app.core.security import encryption_utils
 from app.models.encryption import EncryptionKey, KeyRotationHistory
 from app.core.config import settings
 
+# Active-key rows and decrypted key material are reused across requests;
+# rotate_key and disable_key drop the affected entries
+ACTIVE_KEY_TTL = 60
+KEY_DATA_TTL = 300
+_KEY_CACHE_SIZE = 256
+_active_key_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_key_data_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_key_cache_lock = threading.Lock()
+
+# rotate_key re-reads and retries when another rotation wins the version race
+ROTATE_RETRIES = 3
+
+def _cache_get(cache: OrderedDict, cache_key: tuple):
+    with _key_cache_lock:
+        entry = cache.get(cache_key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+    return None
+
+def _cache_put(cache: OrderedDict, cache_key: tuple, value, ttl: int) -> None:
+    with _key_cache_lock:
+        cache[cache_key] = (time.monotonic() + ttl, value)
+        cache.move_to_end(cache_key)
+        while len(cache) > _KEY_CACHE_SIZE:
+            cache.popitem(last=False)
+
+def invalidate_key_cache(key_id: str, purpose: str, key_type: str) -> None:
+    with _key_cache_lock:
+        _active_key_cache.pop((purpose, key_type), None)
+        for cache_key in [k for k in _key_data_cache if k[0] == key_id]:
+            del _key_data_cache[cache_key]
+
 class KeyManagementService:
     def __init__(self, db: Session):
         self.db = db
@@ -20,17 +58,8 @@ class KeyManagementService:
         """Create a new encryption key."""
         key_id = encryption_utils.secure_random_string()
         
-        # Generate key based on type
-        if key_type == "symmetric":
-            key_data = encryption_utils.secure_random_string(32)
-        elif key_type in ["asymmetric_public", "asymmetric_private"]:
-            key_pair = encryption_utils.generate_key_pair()
-            key_data = key_pair["private_key"] if key_type == "asymmetric_private" else key_pair["public_key"]
-        else:
-            raise ValueError(f"Invalid key type: {key_type}")
-        
-        # Encrypt key data using master key
-        encrypted_key_data = encryption_utils.encrypt_sensitive_data({"key": key_data})
+        # Generate key based on type, encrypted with the master key
+        encrypted_key_data = self._generate_key_data(key_type)
         
         # Calculate expiry date
         expires_at = None
@@ -49,8 +78,8 @@ class KeyManagementService:
         )
         
         self.db.add(key)
+        # Nothing server-generated is needed back beyond the id, which the INSERT returns
         self.db.commit()
-        self.db.refresh(key)
         
         return key
     
@@ -61,44 +90,120 @@ class KeyManagementService:
         reason: str = "scheduled"
     ) -> EncryptionKey:
         """Rotate an existing encryption key."""
-        key = self.db.query(EncryptionKey).filter(EncryptionKey.key_id == key_id).first()
-        if not key:
-            raise ValueError(f"Key not found: {key_id}")
-        
-        # Generate new key data
-        if key.key_type == "symmetric":
-            new_key_data = encryption_utils.secure_random_string(32)
-        elif key.key_type in ["asymmetric_public", "asymmetric_private"]:
-            key_pair = encryption_utils.generate_key_pair()
-            new_key_data = key_pair["private_key"] if key.key_type == "asymmetric_private" else key_pair["public_key"]
-        
-        # Encrypt new key data
-        encrypted_key_data = encryption_utils.encrypt_sensitive_data({"key": new_key_data})
-        
-        # Create rotation history record
-        rotation = KeyRotationHistory(
-            key_id=key_id,
-            rotated_by=rotated_by,
-            old_version=key.version,
-            new_version=key.version + 1,
-            reason=reason
+        for _ in range(ROTATE_RETRIES):
+            current = (
+                self.db.query(EncryptionKey.key_type, EncryptionKey.purpose, EncryptionKey.version)
+                .filter(EncryptionKey.key_id == key_id)
+                .first()
+            )
+            if not current:
+                raise ValueError(f"Key not found: {key_id}")
+            key_type, purpose, version = current
+            
+            # Generate and encrypt new key data
+            encrypted_key_data = self._generate_key_data(key_type)
+            
+            # Compare-and-set on the version read above; a concurrent rotation makes this match nothing
+            key = self.db.execute(
+                update(EncryptionKey)
+                .where(EncryptionKey.key_id == key_id, EncryptionKey.version == version)
+                .values(
+                    key_data=encrypted_key_data,
+                    version=EncryptionKey.version + 1,
+                    last_rotated_at=datetime.utcnow(),
+                    last_rotated_by=rotated_by
+                )
+                .returning(EncryptionKey)
+            ).scalar_one_or_none()
+            if key is None:
+                self.db.rollback()
+                continue
+            
+            # Create rotation history record in the same transaction
+            self.db.add(KeyRotationHistory(
+                key_id=key_id,
+                rotated_by=rotated_by,
+                old_version=version,
+                new_version=version + 1,
+                reason=reason
+            ))
+            self.db.commit()
+            invalidate_key_cache(key_id, purpose, key_type)
+            
+            return key
+        raise ValueError(f"Key {key_id} is being rotated concurrently; try again")
+    
+    def rotate_keys_bulk(self, rotated_by: int, reason: str = "scheduled") -> int:
+        """Rotate every key due for rotation in one transaction; returns how many were rotated."""
+        due = (
+            self.db.query(EncryptionKey.id, EncryptionKey.key_id, EncryptionKey.key_type,
+                          EncryptionKey.purpose, EncryptionKey.version)
+            .filter(self._rotation_due())
+            .all()
         )
+        if not due:
+            return 0
+        
+        # Seal all new key material in one batch against the shared AEAD context
+        sealed = encryption_utils.encrypt_many([
+            self._new_key_material(key_type).encode() for _, _, key_type, _, _ in due
+        ])
         
-        # Update key record
-        key.key_data = encrypted_key_data
-        key.version += 1
-        key.last_rotated_at = datetime.utcnow()
-        key.last_rotated_by = rotated_by
+        now = datetime.utcnow()
+        key_updates = []
+        histories = []
+        for (id_, key_id, _, _, version), key_data in zip(due, sealed):
+            key_updates.append({
+                "id": id_,
+                "key_data": key_data,
+                "version": version + 1,
+                "last_rotated_at": now,
+                "last_rotated_by": rotated_by
+            })
+            histories.append({
+                "key_id": key_id,
+                "rotated_at": now,
+                "rotated_by": rotated_by,
+                "old_version": version,
+                "new_version": version + 1,
+                "reason": reason
+            })
         
-        self.db.add(rotation)
+        # One executemany per table, updates matched by primary key
+        self.db.execute(update(EncryptionKey), key_updates)
+        self.db.execute(insert(KeyRotationHistory), histories)
         self.db.commit()
-        self.db.refresh(key)
         
-        return key
+        for _, key_id, key_type, purpose, _ in due:
+            invalidate_key_cache(key_id, purpose, key_type)
+        return len(due)
+    
+    def _generate_key_data(self, key_type: str) -> bytes:
+        """Generate new key material for a key type, encrypted with the master key."""
+        return encryption_utils.encrypt_bytes(self._new_key_material(key_type).encode())
+    
+    def _new_key_material(self, key_type: str) -> str:
+        """Generate plaintext key material for a key type."""
+        if key_type == "symmetric":
+            # 256 bits straight from the OS CSPRNG in one read
+            key_data = base64.urlsafe_b64encode(os.urandom(32)).decode()
+        elif key_type in ["asymmetric_public", "asymmetric_private"]:
+            key_pair = encryption_utils.generate_key_pair()
+            key_data = key_pair["private_key"] if key_type == "asymmetric_private" else key_pair["public_key"]
+        else:
+            raise ValueError(f"Invalid key type: {key_type}")
+        return key_data
     
     def get_active_key(self, purpose: str, key_type: str) -> Optional[EncryptionKey]:
         """Get the active key for a specific purpose and type."""
-        return (
+        cached = _cache_get(_active_key_cache, (purpose, key_type))
+        if cached and (cached["expires_at"] is None or cached["expires_at"] > datetime.utcnow()):
+            # Attach a copy of the cached row to this session without a SELECT
+            key = EncryptionKey(**cached)
+            make_transient_to_detached(key)
+            return self.db.merge(key, load=False)
+        
+        key = (
             self.db.query(EncryptionKey)
             .filter(
                 EncryptionKey.purpose == purpose,
@@ -111,42 +216,58 @@ class KeyManagementService:
             )
             .first()
         )
+        if key:
+            columns = {column.key: getattr(key, column.key) for column in EncryptionKey.__table__.columns}
+            _cache_put(_active_key_cache, (purpose, key_type), columns, ACTIVE_KEY_TTL)
+        return key
     
     def get_key_data(self, key: EncryptionKey) -> str:
         """Decrypt and return the key data."""
-        encrypted_data = key.key_data
-        decrypted_data = encryption_utils.decrypt_sensitive_data(encrypted_data)
-        return decrypted_data["key"]
+        # A rotation bumps the version, so stale material is never served for it
+        cache_key = (key.key_id, key.version)
+        key_data = _cache_get(_key_data_cache, cache_key)
+        if key_data is None:
+            encrypted_data = key.key_data
+            if encryption_utils.is_raw_sealed(encrypted_data):
+                key_data = encryption_utils.decrypt_bytes(encrypted_data).decode()
+            else:
+                # Rows from before key_data became binary: the bytes of a sealed {"key": ...} document
+                decrypted_data = encryption_utils.decrypt_sensitive_data(base64.b64encode(encrypted_data).decode())
+                key_data = decrypted_data["key"]
+            _cache_put(_key_data_cache, cache_key, key_data, KEY_DATA_TTL)
+        return key_data
     
     def check_keys_for_rotation(self) -> List[EncryptionKey]:
         """Check for keys that need rotation based on age."""
+        return self.db.query(EncryptionKey).filter(self._rotation_due()).all()
+    
+    def _rotation_due(self):
+        """Active keys older than the rotation window, by last rotation or else creation."""
         rotation_threshold = datetime.utcnow() - timedelta(
             days=settings.ENCRYPTION_KEY_ROTATION_DAYS
         )
-        
-        keys_to_rotate = (
-            self.db.query(EncryptionKey)
-            .filter(
-                EncryptionKey.is_active == True,
+        return (
+            (EncryptionKey.is_active == True) &
+            (
+                (EncryptionKey.last_rotated_at < rotation_threshold) |
                 (
-                    (EncryptionKey.last_rotated_at < rotation_threshold) |
-                    (
-                        (EncryptionKey.last_rotated_at.is_(None)) &
-                        (EncryptionKey.created_at < rotation_threshold)
-                    )
+                    (EncryptionKey.last_rotated_at.is_(None)) &
+                    (EncryptionKey.created_at < rotation_threshold)
                 )
             )
-            .all()
         )
-        
-        return keys_to_rotate
     
     def disable_key(self, key_id: str) -> None:
         """Disable a key."""
-        key = self.db.query(EncryptionKey).filter(EncryptionKey.key_id == key_id).first()
-        if key:
-            key.is_active = False
-            self.db.commit()
+        disabled = self.db.execute(
+            update(EncryptionKey)
+            .where(EncryptionKey.key_id == key_id)
+            .values(is_active=False)
+            .returning(EncryptionKey.purpose, EncryptionKey.key_type)
+        ).first()
+        self.db.commit()
+        if disabled:
+            invalidate_key_cache(key_id, *disabled)
     
     def get_rotation_history(self, key_id: str) -> List[KeyRotationHistory]:
         """Get rotation history for a key."""
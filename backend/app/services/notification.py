@@ -1,17 +1,60 @@
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from sqlalchemy.orm import Session
 from datetime import datetime
 from app.models.user import User
 from app.models.transaction import Transaction, TransactionStatus
 from app.core.config import settings
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import json
 import logging
+from string import Formatter
 
 logger = logging.getLogger(__name__)
 
+def compile_template(template: str) -> Callable[[Dict], str]:
+    """
+    Specialize a str.format template into a function once; rendering is a single
+    concatenation with no parsing. Literals and format specs are bound as names,
+    never spliced into the generated source.
+    """
+    namespace: Dict = {"_format": format}
+    terms = []
+    for index, (literal, field, spec, _) in enumerate(Formatter().parse(template)):
+        if literal:
+            namespace[f"_literal{index}"] = literal
+            terms.append(f"_literal{index}")
+        if field is not None:
+            namespace[f"_spec{index}"] = spec
+            terms.append(f"_format(data[{field!r}], _spec{index})")
+    exec(f"def render(data):\n    return {' + '.join(terms) or repr('')}", namespace)
+    return namespace["render"]
+
+_EMAIL_TEMPLATES = {
+    # In a real application, these would be proper HTML templates
+    "transaction_success": compile_template("""
+                <h2>Transaction Successful</h2>
+                <p>Amount: ${amount}</p>
+                <p>Transaction ID: {transaction_id}</p>
+                <p>Date: {date}</p>
+            """),
+    "suspicious_activity": compile_template("""
+                <h2>Suspicious Activity Detected</h2>
+                <p>We detected suspicious activity on your account.</p>
+                <p>Details:</p>
+                <ul>
+                    <li>Activity Type: {activity_type}</li>
+                    <li>Location: {location}</li>
+                    <li>Time: {time}</li>
+                </ul>
+            """)
+}
+
+_SMS_TEMPLATES = {
+    "transaction_success": compile_template("Transaction successful: ${amount}. ID: {transaction_id}"),
+    "suspicious_activity": compile_template("Suspicious activity detected on your account. Location: {location}")
+}
+
+_EMPTY_TEMPLATE = compile_template("")
+
 class NotificationService:
     @staticmethod
     async def send_notification(
@@ -22,11 +65,9 @@ class NotificationService:
     ) -> Dict[str, bool]:
         """Send notification through specified channels"""
         if channels is None:
-            channels = ["email"] if user.notification_settings.get("email", True) else []
-            if user.notification_settings.get("sms", False):
-                channels.append("sms")
-            if user.notification_settings.get("push", False):
-                channels.append("push")
+            channels = user.active_channels
+        if not channels:
+            return {}
 
         results = {}
         
@@ -51,7 +92,7 @@ class NotificationService:
                         data
                     )
             except Exception as e:
-                logger.error(f"Failed to send {channel} notification: {str(e)}")
+                logger.error("Failed to send %s notification: %s", channel, e)
                 results[channel] = False
 
         return results
@@ -63,16 +104,18 @@ class NotificationService:
         data: Dict
     ) -> bool:
         """Send email notification"""
+        from email.message import EmailMessage
+        
         try:
             subject = NotificationService._get_email_subject(notification_type)
             body = NotificationService._get_email_template(notification_type, data)
 
-            msg = MIMEMultipart()
+            # A single text/html part; no multipart container is needed for one body
+            msg = EmailMessage()
             msg["From"] = settings.SMTP_SENDER
             msg["To"] = email
             msg["Subject"] = subject
-
-            msg.attach(MIMEText(body, "html"))
+            msg.set_content(body, subtype="html")
 
             # TODO: Replace with actual SMTP configuration
             # with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
@@ -80,11 +123,11 @@ class NotificationService:
             #     server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
             #     server.send_message(msg)
 
-            logger.info(f"Email notification sent to {email}")
+            logger.info("Email notification sent to %s", email)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send email: {str(e)}")
+            logger.error("Failed to send email: %s", e)
             return False
 
     @staticmethod
@@ -102,11 +145,11 @@ class NotificationService:
             #     to=phone
             # )
             
-            logger.info(f"SMS notification sent to {phone}")
+            logger.info("SMS notification sent to %s", phone)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send SMS: {str(e)}")
+            logger.error("Failed to send SMS: %s", e)
             return False
 
     @staticmethod
@@ -127,11 +170,11 @@ class NotificationService:
             # )
             # response = messaging.send_multicast(message)
             
-            logger.info(f"Push notification sent to {len(device_tokens)} devices")
+            logger.info("Push notification sent to %d devices", len(device_tokens))
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send push notification: {str(e)}")
+            logger.error("Failed to send push notification: %s", e)
             return False
 
     @staticmethod
@@ -152,37 +195,12 @@ class NotificationService:
     @staticmethod
     def _get_email_template(notification_type: str, data: Dict) -> str:
         """Get email template based on notification type"""
-        # In a real application, these would be proper HTML templates
-        templates = {
-            "transaction_success": """
-                <h2>Transaction Successful</h2>
-                <p>Amount: ${amount}</p>
-                <p>Transaction ID: {transaction_id}</p>
-                <p>Date: {date}</p>
-            """,
-            "suspicious_activity": """
-                <h2>Suspicious Activity Detected</h2>
-                <p>We detected suspicious activity on your account.</p>
-                <p>Details:</p>
-                <ul>
-                    <li>Activity Type: {activity_type}</li>
-                    <li>Location: {location}</li>
-                    <li>Time: {time}</li>
-                </ul>
-            """
-        }
-        template = templates.get(notification_type, "")
-        return template.format(**data)
+        return _EMAIL_TEMPLATES.get(notification_type, _EMPTY_TEMPLATE)(data)
 
     @staticmethod
     def _get_sms_template(notification_type: str, data: Dict) -> str:
         """Get SMS template based on notification type"""
-        templates = {
-            "transaction_success": "Transaction successful: ${amount}. ID: {transaction_id}",
-            "suspicious_activity": "Suspicious activity detected on your account. Location: {location}"
-        }
-        template = templates.get(notification_type, "")
-        return template.format(**data)
+        return _SMS_TEMPLATES.get(notification_type, _EMPTY_TEMPLATE)(data)
 
     @staticmethod
     def _get_push_template(notification_type: str, data: Dict) -> Dict:
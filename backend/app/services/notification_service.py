@@ -1,15 +1,86 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, TYPE_CHECKING
 from datetime import datetime
+import asyncio
+import json
+import logging
+import time
 from sqlalchemy.orm import Session
 from fastapi import BackgroundTasks
 from app.core.config import settings
 from app.models.user import User
 from app.models.transaction import Transaction, TransactionType, TransactionStatus
 from app.models.notification import Notification, NotificationType, NotificationPriority
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import requests
+from app.services.notification import compile_template
+
+logger = logging.getLogger(__name__)
+
+# Transport libraries load on first send, not at startup
+if TYPE_CHECKING:
+    import aiohttp
+    import aiosmtplib
+
+# One keep-alive HTTP pool per process; services are built per request, so they share it
+_http_session: "Optional[aiohttp.ClientSession]" = None
+
+def _get_http_session() -> "aiohttp.ClientSession":
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        import aiohttp
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300)
+        )
+    return _http_session
+
+# One authenticated SMTP connection per process, used by one sender at a time
+_smtp: "Optional[aiosmtplib.SMTP]" = None
+_smtp_lock: Optional[asyncio.Lock] = None
+
+def _get_smtp_lock() -> asyncio.Lock:
+    global _smtp_lock
+    if _smtp_lock is None:
+        _smtp_lock = asyncio.Lock()
+    return _smtp_lock
+
+def _reset_smtp() -> None:
+    global _smtp
+    if _smtp is not None:
+        _smtp.close()
+        _smtp = None
+
+_COMPLIANCE_TEMPLATES = {
+    alert_type: compile_template(template)
+    for alert_type, template in {
+        "kyc_required": "Action Required: Please complete your KYC verification. {details}",
+        "kyc_approved": "Your KYC verification has been approved.",
+        "kyc_rejected": "Your KYC verification was not approved. Reason: {reason}",
+        "risk_level_change": "Your account risk level has changed to {level}. {details}",
+        "suspicious_activity": "Suspicious activity detected on your account. {details}",
+        "regulatory_update": "Important regulatory update: {details}",
+    }.items()
+}
+_DEFAULT_COMPLIANCE_TEMPLATE = compile_template("Compliance Update: {details}")
+
+# Notifications in the same second share one formatted timestamp
+_timestamp_cache = (0, "")
+
+def _utc_timestamp() -> str:
+    global _timestamp_cache
+    second = int(time.time())
+    cached_second, formatted = _timestamp_cache
+    if cached_second != second:
+        formatted = datetime.utcfromtimestamp(second).isoformat()
+        _timestamp_cache = (second, formatted)
+    return formatted
+
+HIGH_VALUE_AMOUNT = 1000
+_HIGH_PRIORITY_STATUSES = frozenset({TransactionStatus.FAILED, TransactionStatus.FLAGGED})
+_MEDIUM_PRIORITY_TYPES = frozenset({TransactionType.WITHDRAWAL, TransactionType.TRANSFER})
+
+def _details_text(details: Any) -> str:
+    """Notification details as text; structured details become JSON rather than a Python repr"""
+    if isinstance(details, str):
+        return details
+    return json.dumps(details, default=str, separators=(",", ":"))
 
 class NotificationService:
     def __init__(self):
@@ -18,6 +89,22 @@ class NotificationService:
         self.sms_api_key = settings.SMS_API_KEY
         self.push_api_key = settings.PUSH_API_KEY
 
+    @staticmethod
+    async def aclose() -> None:
+        """Close the shared HTTP session; called on application shutdown."""
+        global _http_session
+        if _http_session is not None:
+            await _http_session.close()
+            _http_session = None
+        async with _get_smtp_lock():
+            if _smtp is not None and _smtp.is_connected:
+                import aiosmtplib
+                try:
+                    await _smtp.quit()
+                except aiosmtplib.SMTPException:
+                    pass
+            _reset_smtp()
+
     async def send_transaction_notification(
         self,
         transaction: Transaction,
@@ -167,7 +254,7 @@ class NotificationService:
             "title": f"Security Alert: {alert_type}",
             "type": alert_type,
             "details": details,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": _utc_timestamp(),
             "action_required": True
         }
 
@@ -177,22 +264,12 @@ class NotificationService:
             "title": f"Account Update: {notification_type}",
             "type": notification_type,
             "details": details,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": _utc_timestamp()
         }
 
     def _prepare_compliance_content(self, alert_type: str, details: Dict[str, Any]) -> str:
         """Prepare compliance alert content."""
-        templates = {
-            "kyc_required": "Action Required: Please complete your KYC verification. {details}",
-            "kyc_approved": "Your KYC verification has been approved.",
-            "kyc_rejected": "Your KYC verification was not approved. Reason: {reason}",
-            "risk_level_change": "Your account risk level has changed to {level}. {details}",
-            "suspicious_activity": "Suspicious activity detected on your account. {details}",
-            "regulatory_update": "Important regulatory update: {details}",
-        }
-        
-        template = templates.get(alert_type, "Compliance Update: {details}")
-        return template.format(**details)
+        return _COMPLIANCE_TEMPLATES.get(alert_type, _DEFAULT_COMPLIANCE_TEMPLATE)(details)
 
     def _prepare_sustainability_content(self, metrics: Dict[str, Any]) -> str:
         """Prepare sustainability metrics content."""
@@ -206,68 +283,85 @@ class NotificationService:
 
     def _determine_priority(self, transaction: Transaction) -> NotificationPriority:
         """Determine notification priority based on transaction details."""
-        if transaction.status == TransactionStatus.FAILED:
-            return NotificationPriority.HIGH
-        elif transaction.status == TransactionStatus.FLAGGED:
+        if transaction.status in _HIGH_PRIORITY_STATUSES or transaction.amount > HIGH_VALUE_AMOUNT:
             return NotificationPriority.HIGH
-        elif transaction.amount > 1000:  # High value transaction
-            return NotificationPriority.HIGH
-        elif transaction.type in [TransactionType.WITHDRAWAL, TransactionType.TRANSFER]:
+        if transaction.type in _MEDIUM_PRIORITY_TYPES:
             return NotificationPriority.MEDIUM
         return NotificationPriority.LOW
 
     async def _send_notifications(self, user: User, notification: Notification) -> None:
         """Send notifications through all enabled channels."""
-        tasks = []
+        tasks = {}
         
         # Check user preferences and send accordingly
         if user.notification_preferences.get("email", True):
-            tasks.append(self._send_email(user.email, notification))
+            tasks["email"] = self._send_email(user.email, notification)
             
         if user.notification_preferences.get("sms", False) and user.phone:
-            tasks.append(self._send_sms(user.phone, notification))
+            tasks["sms"] = self._send_sms(user.phone, notification)
             
         if user.notification_preferences.get("push", True):
-            tasks.append(self._send_push(user.device_tokens, notification))
+            tasks["push"] = self._send_push(user.device_tokens, notification)
         
-        # Execute all notification tasks
-        for task in tasks:
-            try:
-                await task
-            except Exception as e:
-                # Log error but don't stop other notifications
-                print(f"Notification error: {str(e)}")
+        # Execute all notification tasks concurrently; failures come back as values
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for channel, result in zip(tasks, results):
+            if isinstance(result, Exception):
+                logger.error("Notification channel %s failed: %s", channel, result)
 
     async def _send_email(self, email: str, notification: Notification) -> None:
         """Send email notification."""
-        msg = MIMEMultipart()
+        import aiosmtplib
+        from email.message import EmailMessage
+        
+        # A single text/html part; no multipart container is needed for one body
+        msg = EmailMessage()
         msg['From'] = self.email_sender
         msg['To'] = email
         msg['Subject'] = notification.content['title']
         
         # Create HTML content
         html = self._create_email_template(notification)
-        msg.attach(MIMEText(html, 'html'))
+        msg.set_content(html, subtype='html')
         
-        # Send email
-        with smtplib.SMTP_SSL(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
-            server.login(self.email_sender, self.email_password)
-            server.send_message(msg)
+        # Send over the pooled connection; a dropped connection is reopened and retried once
+        async with _get_smtp_lock():
+            for attempt in range(2):
+                try:
+                    smtp = await self._smtp_connection()
+                    await smtp.send_message(msg)
+                    return
+                except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError):
+                    _reset_smtp()
+                    if attempt:
+                        raise
+
+    async def _smtp_connection(self) -> "aiosmtplib.SMTP":
+        """Return the shared SMTP connection, connecting and logging in if needed. Caller holds the lock."""
+        global _smtp
+        if _smtp is None or not _smtp.is_connected:
+            import aiosmtplib
+            _reset_smtp()
+            smtp = aiosmtplib.SMTP(hostname=settings.SMTP_SERVER, port=settings.SMTP_PORT, use_tls=True)
+            await smtp.connect()
+            await smtp.login(self.email_sender, self.email_password)
+            _smtp = smtp
+        return _smtp
 
     async def _send_sms(self, phone: str, notification: Notification) -> None:
         """Send SMS notification."""
         message = self._create_sms_content(notification)
         
         # Use SMS provider's API
-        response = requests.post(
+        async with _get_http_session().post(
             settings.SMS_API_URL,
             headers={"Authorization": f"Bearer {self.sms_api_key}"},
             json={
                 "phone": phone,
                 "message": message
             }
-        )
-        response.raise_for_status()
+        ) as response:
+            response.raise_for_status()
 
     async def _send_push(self, device_tokens: List[str], notification: Notification) -> None:
         """Send push notification."""
@@ -277,15 +371,15 @@ class NotificationService:
         payload = self._create_push_payload(notification)
         
         # Use push notification service API
-        response = requests.post(
+        async with _get_http_session().post(
             settings.PUSH_API_URL,
             headers={"Authorization": f"Bearer {self.push_api_key}"},
             json={
                 "tokens": device_tokens,
                 "payload": payload
             }
-        )
-        response.raise_for_status()
+        ) as response:
+            response.raise_for_status()
 
     def _create_email_template(self, notification: Notification) -> str:
         """Create HTML email template."""
@@ -295,7 +389,7 @@ class NotificationService:
             <body>
                 <h2>{notification.content['title']}</h2>
                 <p>Time: {notification.content['timestamp']}</p>
-                <div>{str(notification.content['details'])}</div>
+                <div>{_details_text(notification.content['details'])}</div>
                 <hr>
                 <small>This is a secure notification from your banking system.</small>
             </body>
@@ -304,13 +398,13 @@ class NotificationService:
 
     def _create_sms_content(self, notification: Notification) -> str:
         """Create SMS content."""
-        return f"{notification.content['title']}: {str(notification.content['details'])[:100]}"
+        return f"{notification.content['title']}: {_details_text(notification.content['details'])[:100]}"
 
     def _create_push_payload(self, notification: Notification) -> Dict[str, Any]:
         """Create push notification payload."""
         return {
             "title": notification.content['title'],
-            "body": str(notification.content['details']),
+            "body": _details_text(notification.content['details']),
             "priority": notification.priority.value,
             "data": {
                 "type": notification.type.value,
@@ -1,16 +1,29 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 from datetime import datetime, timedelta
+from decimal import Decimal
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from app.models.transaction import Transaction
+from sqlalchemy import func, and_, case
+from app.models.transaction import Transaction, TransactionStatus
 from app.models.user import User
 from app.models.account import Account
-import pandas as pd
+import csv
+import io
 import json
 from fastapi import HTTPException
 from app.core.security_middleware import security_middleware
 from app.core.monitoring import monitoring
 
+REPORT_FETCH_SIZE = 10_000
+CSV_FLUSH_ROWS = 1000
+DETAILED_REPORT_FIELDS = [
+    "id", "user_id", "type", "amount", "status", "created_at",
+    "source_account", "destination_account", "metadata"
+]
+
+def _from_minor(cents: Any) -> Decimal:
+    """Convert an aggregated amount_minor value back to a currency Decimal"""
+    return Decimal(cents).scaleb(-2)
+
 class ReportingService:
     def __init__(self, db: Session):
         self.db = db
@@ -23,100 +36,203 @@ class ReportingService:
         user_id: Optional[int] = None
     ) -> Dict[str, Any]:
         """Generate transaction report based on specified parameters"""
-        query = self.db.query(Transaction)
-        
-        # Apply date filters
-        query = query.filter(
-            and_(
-                Transaction.created_at >= start_date,
-                Transaction.created_at <= end_date
-            )
-        )
-        
-        # Apply user filter if specified
-        if user_id:
-            query = query.filter(Transaction.user_id == user_id)
-        
-        transactions = query.all()
+        filters = self._transaction_filters(start_date, end_date, user_id)
         
         if report_type == "summary":
-            return self._generate_summary_report(transactions)
+            return self._generate_summary_report(filters)
         elif report_type == "detailed":
-            return self._generate_detailed_report(transactions)
+            return self._generate_detailed_report(filters)
         else:
             raise HTTPException(status_code=400, detail="Invalid report type")
 
-    def _generate_summary_report(self, transactions: List[Transaction]) -> Dict[str, Any]:
-        """Generate summary report from transactions"""
-        total_amount = sum(t.amount for t in transactions)
-        successful_count = len([t for t in transactions if t.status == "completed"])
-        failed_count = len([t for t in transactions if t.status == "failed"])
+    def _transaction_filters(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        user_id: Optional[int] = None
+    ) -> List[Any]:
+        """Date range filter, plus the user filter if specified"""
+        filters = [
+            Transaction.created_at >= start_date,
+            Transaction.created_at <= end_date
+        ]
+        if user_id:
+            filters.append(Transaction.user_id == user_id)
+        return filters
+
+    def _generate_summary_report(self, filters: List[Any]) -> Dict[str, Any]:
+        """Generate summary report, aggregated in the database"""
+        total_count, total_minor, successful_count, failed_count = (
+            self.db.query(
+                func.count(Transaction.id),
+                func.coalesce(func.sum(Transaction.amount_minor), 0),
+                func.count(case((Transaction.status == TransactionStatus.COMPLETED, 1))),
+                func.count(case((Transaction.status == TransactionStatus.FAILED, 1)))
+            )
+            .filter(*filters)
+            .one()
+        )
         
         # Group by transaction type
-        type_distribution = {}
-        for t in transactions:
-            type_distribution[t.type] = type_distribution.get(t.type, 0) + 1
+        type_distribution = {
+            t.value: count
+            for t, count in self.db.query(Transaction.type, func.count(Transaction.id))
+            .filter(*filters)
+            .group_by(Transaction.type)
+            .all()
+        }
         
         # Calculate hourly distribution
-        hourly_distribution = {}
-        for t in transactions:
-            hour = t.created_at.hour
-            hourly_distribution[hour] = hourly_distribution.get(hour, 0) + 1
+        hour = func.extract("hour", Transaction.created_at)
+        hourly_distribution = {
+            int(h): count
+            for h, count in self.db.query(hour, func.count(Transaction.id))
+            .filter(*filters)
+            .group_by(hour)
+            .all()
+        }
         
+        total_amount = _from_minor(total_minor)
         return {
-            "total_transactions": len(transactions),
+            "total_transactions": total_count,
             "total_amount": total_amount,
             "successful_transactions": successful_count,
             "failed_transactions": failed_count,
-            "success_rate": (successful_count / len(transactions)) if transactions else 0,
+            "success_rate": (successful_count / total_count) if total_count else 0,
             "type_distribution": type_distribution,
             "hourly_distribution": hourly_distribution,
-            "average_amount": total_amount / len(transactions) if transactions else 0
+            "average_amount": total_amount / total_count if total_count else 0
         }
 
-    def _generate_detailed_report(self, transactions: List[Transaction]) -> Dict[str, Any]:
+    def _generate_detailed_report(self, filters: List[Any]) -> Dict[str, Any]:
         """Generate detailed report from transactions"""
-        transaction_details = []
-        
-        for t in transactions:
-            transaction_details.append({
-                "id": t.id,
-                "user_id": t.user_id,
-                "type": t.type,
-                "amount": t.amount,
-                "status": t.status,
-                "created_at": t.created_at.isoformat(),
-                "source_account": t.source_account_id,
-                "destination_account": t.destination_account_id,
-                "metadata": t.metadata
-            })
+        transaction_details = list(self._iter_transaction_details(filters))
         
         return {
             "transactions": transaction_details,
             "total_count": len(transaction_details)
         }
 
+    def _iter_transaction_details(self, filters: List[Any]) -> Iterator[Dict[str, Any]]:
+        """Yield detailed report rows from a server-side cursor, REPORT_FETCH_SIZE rows at a time"""
+        for id_, user_id, type_, amount, status, created_at, account_id, recipient_account, metadata \
+                in self._transaction_detail_rows(filters):
+            yield {
+                "id": id_,
+                "user_id": user_id,
+                "type": type_,
+                "amount": amount,
+                "status": status,
+                "created_at": created_at.isoformat(),
+                "source_account": account_id,
+                "destination_account": recipient_account,
+                "metadata": metadata
+            }
+
+    def _transaction_detail_rows(self, filters: List[Any]):
+        """Detailed report columns, streamed from a server-side cursor"""
+        # Plain column rows: no ORM instances to build or track per transaction
+        return (
+            self.db.query(
+                Transaction.id,
+                Transaction.user_id,
+                Transaction.type,
+                Transaction.amount,
+                Transaction.status,
+                Transaction.created_at,
+                Transaction.account_id,
+                Transaction.recipient_account,
+                Transaction.metadata
+            )
+            .filter(*filters)
+            .execution_options(stream_results=True)
+            .yield_per(REPORT_FETCH_SIZE)
+        )
+
+    def stream_detailed_report_csv(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        user_id: Optional[int] = None
+    ) -> Iterator[str]:
+        """Stream the detailed transaction report as CSV chunks with bounded memory"""
+        filters = self._transaction_filters(start_date, end_date, user_id)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=DETAILED_REPORT_FIELDS)
+        writer.writeheader()
+        for row_count, row in enumerate(self._iter_transaction_details(filters), 1):
+            writer.writerow(row)
+            if row_count % CSV_FLUSH_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def export_detailed_report_parquet(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        user_id: Optional[int] = None
+    ) -> bytes:
+        """
+        Export the detailed transaction report as zstd-compressed Parquet.
+        Written one REPORT_FETCH_SIZE row group at a time; type and status are dictionary-encoded.
+        """
+        # Imported here so workers that never export Parquet skip loading pyarrow
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ("id", pa.int64()),
+            ("user_id", pa.int64()),
+            ("type", pa.string()),
+            ("amount", pa.decimal128(18, 2)),
+            ("status", pa.string()),
+            ("created_at", pa.timestamp("us")),
+            ("source_account", pa.int64()),
+            ("destination_account", pa.string()),
+            ("metadata", pa.string())
+        ])
+        filters = self._transaction_filters(start_date, end_date, user_id)
+        buffer = pa.BufferOutputStream()
+        with pq.ParquetWriter(buffer, schema, compression="zstd", use_dictionary=["type", "status"]) as writer:
+            columns = [[] for _ in schema]
+            for row in self._transaction_detail_rows(filters):
+                for column, value in zip(columns, row):
+                    column.append(value)
+                if len(columns[0]) == REPORT_FETCH_SIZE:
+                    writer.write_table(self._parquet_batch(pa, schema, columns))
+                    columns = [[] for _ in schema]
+            if columns[0]:
+                writer.write_table(self._parquet_batch(pa, schema, columns))
+        return buffer.getvalue().to_pybytes()
+
+    @staticmethod
+    def _parquet_batch(pa, schema, columns: List[List[Any]]):
+        """Build one Arrow table from buffered column lists; enums become their values, JSON becomes text"""
+        id_, user_id, type_, amount, status, created_at, source, destination, metadata = columns
+        type_ = [t.value if t is not None else None for t in type_]
+        status = [s.value if s is not None else None for s in status]
+        metadata = [json.dumps(m) if m is not None else None for m in metadata]
+        arrays = [id_, user_id, type_, amount, status, created_at, source, destination, metadata]
+        return pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(arrays, schema)],
+            schema=schema
+        )
+
     async def generate_user_activity_report(
         self,
         start_date: datetime,
         end_date: datetime
     ) -> Dict[str, Any]:
         """Generate user activity report"""
-        # Get user registrations
-        new_users = self.db.query(User).filter(
-            and_(
-                User.created_at >= start_date,
-                User.created_at <= end_date
-            )
-        ).count()
-        
-        # Get active users
-        active_users = self.db.query(User).filter(
-            and_(
-                User.last_login >= start_date,
-                User.last_login <= end_date
-            )
-        ).count()
+        # Get user registrations and active users in one round-trip
+        registered = User.created_at.between(start_date, end_date)
+        logged_in = User.last_login.between(start_date, end_date)
+        new_users, active_users = self.db.query(
+            func.count(User.id).filter(registered),
+            func.count(User.id).filter(logged_in)
+        ).filter(registered | logged_in).one()
         
         # Get security events
         security_events = security_middleware.get_security_events(
@@ -144,22 +260,28 @@ class ReportingService:
     ) -> str:
         """Export report data to CSV format"""
         if report_type == "transactions_summary":
-            df = pd.DataFrame([report_data])
-            df = df.drop(['type_distribution', 'hourly_distribution'], axis=1)
+            rows = [{
+                key: value for key, value in report_data.items()
+                if key not in ('type_distribution', 'hourly_distribution')
+            }]
         elif report_type == "transactions_detailed":
-            df = pd.DataFrame(report_data['transactions'])
+            rows = report_data['transactions']
         elif report_type == "user_activity":
-            df = pd.DataFrame([{
+            rows = [{
                 'new_users': report_data['new_users'],
                 'active_users': report_data['active_users'],
                 'security_events_count': len(report_data['security_events']),
                 'engagement_score': report_data['engagement_metrics'].get('engagement_score', 0)
-            }])
+            }]
         else:
             raise HTTPException(status_code=400, detail="Invalid report type for export")
         
         # Convert to CSV
-        return df.to_csv(index=False)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(rows[0]) if rows else DETAILED_REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue()
 
     async def get_report_metrics(
         self,
@@ -181,27 +303,12 @@ class ReportingService:
         end_date: datetime
     ) -> Dict[str, Any]:
         """Get transaction-related metrics"""
-        # Get transaction counts by type
-        type_counts = (
-            self.db.query(
-                Transaction.type,
-                func.count(Transaction.id).label('count')
-            )
-            .filter(
-                and_(
-                    Transaction.created_at >= start_date,
-                    Transaction.created_at <= end_date
-                )
-            )
-            .group_by(Transaction.type)
-            .all()
-        )
-        
-        # Get average transaction amounts by type
-        avg_amounts = (
+        # Counts and average amounts by type in one grouped query
+        type_metrics = (
             self.db.query(
                 Transaction.type,
-                func.avg(Transaction.amount).label('average')
+                func.count(Transaction.id).label('count'),
+                func.avg(Transaction.amount_minor).label('average')
             )
             .filter(
                 and_(
@@ -214,8 +321,8 @@ class ReportingService:
         )
         
         return {
-            "type_counts": dict(type_counts),
-            "average_amounts": {t: float(avg) for t, avg in avg_amounts}
+            "type_counts": {t.value: count for t, count, _ in type_metrics},
+            "average_amounts": {t.value: float(_from_minor(avg)) for t, _, avg in type_metrics}
         }
 
     async def _get_user_activity_metrics(
@@ -1,6 +1,6 @@
 from typing import Optional, List, Dict
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, func, case, update
 from datetime import datetime
 from decimal import Decimal
 from app.models.transaction import Transaction, TransactionType, TransactionStatus
@@ -83,7 +83,7 @@ class TransactionService:
         transaction_id: int,
         risk_score: int = 0
     ) -> Transaction:
-        transaction = TransactionService.get(db, transaction_id=transaction_id)
+        transaction = db.get(Transaction, transaction_id)
         
         try:
             # Update account balance
@@ -97,21 +97,26 @@ class TransactionService:
                 db,
                 account_id=transaction.account_id,
                 amount=transaction.amount,
-                operation=operation
+                operation=operation,
+                commit=False
             )
             
             # Update transaction status
-            transaction.status = TransactionStatus.COMPLETED
-            transaction.processed_at = datetime.utcnow()
-            transaction.risk_score = risk_score
+            values = {
+                "status": TransactionStatus.COMPLETED,
+                "processed_at": datetime.utcnow(),
+                "risk_score": risk_score
+            }
             
         except Exception as e:
-            transaction.status = TransactionStatus.FAILED
-            transaction.failure_reason = str(e)
-            
-        db.add(transaction)
+            values = {
+                "status": TransactionStatus.FAILED,
+                "failure_reason": str(e)
+            }
+        
+        # Same transaction as the balance change; RETURNING refreshes the loaded instance
+        transaction = TransactionService._update_returning(db, transaction_id, values)
         db.commit()
-        db.refresh(transaction)
         
         return transaction
 
@@ -122,20 +127,31 @@ class TransactionService:
         transaction_id: int,
         reason: str
     ) -> Transaction:
-        transaction = TransactionService.get(db, transaction_id=transaction_id)
-        transaction.status = TransactionStatus.FLAGGED
-        transaction.metadata = {
-            **transaction.metadata,
-            "flag_reason": reason,
-            "flagged_at": datetime.utcnow().isoformat()
-        }
-        
-        db.add(transaction)
+        # Merge the flag into metadata server-side instead of round-tripping the JSON
+        transaction = TransactionService._update_returning(db, transaction_id, {
+            "status": TransactionStatus.FLAGGED,
+            "metadata": func.coalesce(Transaction.metadata, func.jsonb_build_object()).op("||")(
+                func.jsonb_build_object(
+                    "flag_reason", reason,
+                    "flagged_at", datetime.utcnow().isoformat()
+                )
+            )
+        })
         db.commit()
-        db.refresh(transaction)
         
         return transaction
 
+    @staticmethod
+    def _update_returning(db: Session, transaction_id: int, values: Dict) -> Optional[Transaction]:
+        """Apply values in one UPDATE ... RETURNING, populating any instance already in the session"""
+        return db.execute(
+            update(Transaction)
+            .where(Transaction.id == transaction_id)
+            .values(**values)
+            .returning(Transaction)
+            .execution_options(populate_existing=True, synchronize_session=False)
+        ).scalar_one_or_none()
+
     @staticmethod
     def get_transaction_statistics(
         db: Session,
@@ -143,45 +159,53 @@ class TransactionService:
         start_date: datetime,
         end_date: datetime
     ) -> Dict:
-        transactions = TransactionService.get_account_transactions(
-            db,
-            account_id=account_id,
-            start_date=start_date,
-            end_date=end_date,
-            limit=1000  # Increased limit for statistics
+        in_range = (
+            Transaction.account_id == account_id,
+            Transaction.created_at >= start_date,
+            Transaction.created_at <= end_date
+        )
+        completed = Transaction.status == TransactionStatus.COMPLETED
+        
+        # Totals, average and risk count in one pass over the range
+        total, credits, debits, average, high_risk = (
+            db.query(
+                func.count(Transaction.id),
+                func.coalesce(func.sum(case(
+                    (Transaction.type.in_((TransactionType.DEPOSIT, TransactionType.INTEREST)) & completed,
+                     Transaction.amount)
+                )), 0),
+                func.coalesce(func.sum(case(
+                    (Transaction.type.in_((TransactionType.WITHDRAWAL, TransactionType.PAYMENT)) & completed,
+                     Transaction.amount)
+                )), 0),
+                func.coalesce(func.avg(Transaction.amount), 0),
+                func.count(case((Transaction.risk_score > 70, 1)))
+            )
+            .filter(*in_range)
+            .one()
         )
         
         stats = {
-            "total_transactions": len(transactions),
-            "total_credits": sum(
-                t.amount for t in transactions 
-                if t.type in [TransactionType.DEPOSIT, TransactionType.INTEREST]
-                and t.status == TransactionStatus.COMPLETED
-            ),
-            "total_debits": sum(
-                t.amount for t in transactions
-                if t.type in [TransactionType.WITHDRAWAL, TransactionType.PAYMENT]
-                and t.status == TransactionStatus.COMPLETED
-            ),
+            "total_transactions": total,
+            "total_credits": credits,
+            "total_debits": debits,
             "transaction_types": {},
             "status_distribution": {},
-            "average_transaction_size": 0,
-            "high_risk_transactions": len([
-                t for t in transactions if t.risk_score > 70
-            ])
+            "average_transaction_size": average,
+            "high_risk_transactions": high_risk
         }
         
-        # Calculate type and status distributions
-        for t in transactions:
-            stats["transaction_types"][t.type.value] = \
-                stats["transaction_types"].get(t.type.value, 0) + 1
-            stats["status_distribution"][t.status.value] = \
-                stats["status_distribution"].get(t.status.value, 0) + 1
-        
-        # Calculate average transaction size
-        if transactions:
-            stats["average_transaction_size"] = sum(
-                t.amount for t in transactions
-            ) / len(transactions)
+        # Calculate type and status distributions from one grouped query
+        groups = (
+            db.query(Transaction.type, Transaction.status, func.count(Transaction.id))
+            .filter(*in_range)
+            .group_by(Transaction.type, Transaction.status)
+            .all()
+        )
+        for transaction_type, status, count in groups:
+            stats["transaction_types"][transaction_type.value] = \
+                stats["transaction_types"].get(transaction_type.value, 0) + count
+            stats["status_distribution"][status.value] = \
+                stats["status_distribution"].get(status.value, 0) + count
         
         return stats
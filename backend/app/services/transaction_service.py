@@ -1,7 +1,9 @@
 from datetime import datetime
 from decimal import Decimal
 from typing import Optional, Dict, List
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from fastapi import HTTPException
 import uuid
 
@@ -81,39 +83,56 @@ class TransactionService:
             
         # Check daily transfer limit
         if transaction.type == TransactionType.TRANSFER:
-            today_transfers = self.db.query(Transaction).filter(
+            total_transfers = self.db.query(
+                func.coalesce(func.sum(Transaction.amount), 0)
+            ).filter(
                 Transaction.account_id == account.id,
                 Transaction.type == TransactionType.TRANSFER,
                 Transaction.created_at >= datetime.now().date()
-            ).all()
-            
-            total_transfers = sum(t.amount for t in today_transfers)
+            ).scalar()
             if total_transfers + transaction.amount > account.daily_transfer_limit:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Amount exceeds daily transfer limit of {account.daily_transfer_limit}"
                 )
 
+    def _apply_balance_delta(self, account: Account, delta: Decimal) -> bool:
+        """
+        Add delta to the account balance in one atomic UPDATE ... RETURNING.
+        Debits only apply while the balance covers them; returns False otherwise.
+        """
+        stmt = (
+            update(Account)
+            .where(Account.id == account.id)
+            .values(balance=Account.balance + delta)
+            .returning(Account.balance)
+            .execution_options(synchronize_session=False)
+        )
+        if delta < 0:
+            stmt = stmt.where(Account.balance >= -delta)
+        balance = self.db.execute(stmt).scalar()
+        if balance is None:
+            return False
+        # Keep the loaded instance in step without reading the row again
+        set_committed_value(account, "balance", balance)
+        return True
+
     async def _process_withdrawal(self, transaction: Transaction, account: Account):
         """Process a withdrawal transaction."""
-        if account.balance < transaction.amount:
+        if not self._apply_balance_delta(account, -transaction.amount):
             raise HTTPException(status_code=400, detail="Insufficient funds")
         
-        account.balance -= transaction.amount
         transaction.status = TransactionStatus.COMPLETED
         transaction.processed_at = datetime.utcnow()
 
     async def _process_deposit(self, transaction: Transaction, account: Account):
         """Process a deposit transaction."""
-        account.balance += transaction.amount
+        self._apply_balance_delta(account, transaction.amount)
         transaction.status = TransactionStatus.COMPLETED
         transaction.processed_at = datetime.utcnow()
 
     async def _process_transfer(self, transaction: Transaction, account: Account):
         """Process a transfer transaction."""
-        if account.balance < transaction.amount:
-            raise HTTPException(status_code=400, detail="Insufficient funds")
-        
         # Find recipient account
         recipient_account = self.db.query(Account).filter(
             Account.account_number == transaction.recipient_account
@@ -125,9 +144,17 @@ class TransactionService:
         if recipient_account.status != AccountStatus.ACTIVE:
             raise HTTPException(status_code=400, detail="Recipient account is not active")
         
-        # Process transfer
-        account.balance -= transaction.amount
-        recipient_account.balance += transaction.amount
+        # Both legs run in the caller's transaction; rows are locked in id order
+        # so opposing concurrent transfers cannot deadlock
+        legs = sorted(
+            ((account, -transaction.amount), (recipient_account, transaction.amount)),
+            key=lambda leg: leg[0].id
+        )
+        for leg_account, delta in legs:
+            if not self._apply_balance_delta(leg_account, delta):
+                self.db.rollback()
+                raise HTTPException(status_code=400, detail="Insufficient funds")
+        
         transaction.status = TransactionStatus.COMPLETED
         transaction.processed_at = datetime.utcnow()
 
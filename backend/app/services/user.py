@@ -1,18 +1,32 @@
 from typing import Optional, List
 from sqlalchemy.orm import Session
-from fastapi.encoders import jsonable_encoder
 from app.core.security import get_password_hash, verify_password
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, UserUpdate
 
+USER_IDS_BY_EMAIL = "user_ids_by_email"
+# Read off the table so importing this module doesn't configure mappers
+_USER_COLUMNS = frozenset(User.__table__.columns.keys())
+
 class UserService:
     @staticmethod
     def get(db: Session, user_id: int) -> Optional[User]:
-        return db.query(User).filter(User.id == user_id).first()
+        # Served from the session's identity map when already loaded in this request
+        return db.get(User, user_id)
 
     @staticmethod
     def get_by_email(db: Session, email: str) -> Optional[User]:
-        return db.query(User).filter(User.email == email).first()
+        # Sessions are per request, so session.info memoizes email -> id for the request
+        user_ids = db.info.setdefault(USER_IDS_BY_EMAIL, {})
+        user_id = user_ids.get(email)
+        if user_id is not None:
+            user = db.get(User, user_id)
+            if user is not None and user.email == email:
+                return user
+        user = db.query(User).filter(User.email == email).first()
+        if user is not None:
+            user_ids[email] = user.id
+        return user
 
     @staticmethod
     def get_multi(
@@ -46,7 +60,6 @@ class UserService:
     def update(
         db: Session, *, db_obj: User, obj_in: UserUpdate
     ) -> User:
-        obj_data = jsonable_encoder(db_obj)
         update_data = obj_in.dict(exclude_unset=True)
         
         if "password" in update_data:
@@ -54,18 +67,19 @@ class UserService:
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
             
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        # Only the submitted fields are touched; no need to serialize the whole row first
+        for field, value in update_data.items():
+            if field in _USER_COLUMNS:
+                setattr(db_obj, field, value)
                 
-        db.add(db_obj)
+        # Expired on commit, so the row reloads only if the caller reads it
         db.commit()
-        db.refresh(db_obj)
         return db_obj
 
     @staticmethod
     def delete(db: Session, *, user_id: int) -> User:
-        obj = db.query(User).get(user_id)
+        obj = db.get(User, user_id)
+        db.info.get(USER_IDS_BY_EMAIL, {}).pop(obj.email, None)
         db.delete(obj)
         db.commit()
         return obj
@@ -0,0 +1,34 @@
+import os
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.models.base import Base
+
+# Register every model so relationship strings resolve when mappers configure
+from app.models import account, auth, budget, compliance, encryption, investment, notification, transaction, user  # noqa: F401
+
+@pytest.fixture(scope="session")
+def engine():
+    """Engine on TEST_DATABASE_URL (a throwaway Postgres database); tests skip without one"""
+    url = os.environ.get("TEST_DATABASE_URL", settings.SQLALCHEMY_DATABASE_URI)
+    engine = create_engine(url)
+    try:
+        engine.connect().close()
+    except OperationalError:
+        pytest.skip("PostgreSQL test database is not reachable")
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+@pytest.fixture
+def db(engine):
+    """Session configured like SessionLocal; tables are emptied after each test"""
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
@@ -0,0 +1,17 @@
+from contextlib import contextmanager
+from typing import Iterator, List
+from sqlalchemy import event
+
+@contextmanager
+def count_queries(conn) -> Iterator[List[str]]:
+    """Collect the SQL statements executed on a connection or engine inside the block"""
+    statements: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(conn, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(conn, "before_cursor_execute", record)
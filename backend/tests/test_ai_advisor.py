@@ -0,0 +1,30 @@
+import pandas as pd
+from app.services.ai_advisor_service import AIAdvisorService
+
+def _recurring(df: pd.DataFrame) -> dict:
+    # The grouping only reads the frame, so no session is needed
+    return AIAdvisorService.__new__(AIAdvisorService)._identify_recurring_expenses(df)
+
+def test_recurring_expenses_groups_by_category_and_description():
+    df = pd.DataFrame({
+        "category": ["utilities"] * 3 + ["food"],
+        "description": ["Power Co"] * 3 + ["Grocer"],
+        "amount": [80.0, 80.0, 82.0, 40.0]
+    })
+    assert _recurring(df) == {"utilities": (80.0 + 80.0 + 82.0) / 3}
+
+def test_recurring_expenses_skips_rows_without_description():
+    df = pd.DataFrame({
+        "category": ["utilities"],
+        "description": [None],
+        "amount": [80.0]
+    })
+    assert _recurring(df) == {}
+
+def test_recurring_expenses_ignores_null_keys_among_real_groups():
+    df = pd.DataFrame({
+        "category": ["utilities"] * 4,
+        "description": ["Power Co", None, "Power Co", "Power Co"],
+        "amount": [80.0, 500.0, 80.0, 80.0]
+    })
+    assert _recurring(df) == {"utilities": 80.0}
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+import pytest
+from app.models.budget import Budget, BudgetAlert, BudgetExpense, BudgetCategory, BudgetPeriod, AlertType
+from app.models.user import User
+from app.schemas.budget import BudgetExpenseCreate
+from app.services.budget_service import BudgetService
+from tests.query_counter import count_queries
+
+BUDGET_COUNT = 3
+EXPENSES_PER_BUDGET = 4
+
+@pytest.fixture
+def user_with_budgets(db):
+    """A user with several budgets, each carrying expenses and an alert"""
+    user = User(email="budgets@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    start = datetime.utcnow() - timedelta(days=10)
+    for i in range(BUDGET_COUNT):
+        budget = Budget(
+            user_id=user.id,
+            name=f"Budget {i}",
+            category=list(BudgetCategory)[i],
+            amount=1000,
+            period=BudgetPeriod.MONTHLY,
+            start_date=start,
+            total_spent=10 * EXPENSES_PER_BUDGET
+        )
+        db.add(budget)
+        db.flush()
+        db.add_all(
+            BudgetExpense(budget_id=budget.id, amount=10, date=start + timedelta(days=j))
+            for j in range(EXPENSES_PER_BUDGET)
+        )
+        db.add(BudgetAlert(budget_id=budget.id, type=AlertType.THRESHOLD, message="alert"))
+    db.commit()
+    user_id = user.id
+    # Start every measurement from an empty identity map
+    db.expunge_all()
+    return user_id
+
+def test_get_category_spending_is_one_query(db, engine, user_with_budgets):
+    service = BudgetService(db)
+    with count_queries(engine) as queries:
+        spending = service.get_category_spending(
+            user_with_budgets,
+            datetime.utcnow() - timedelta(days=30),
+            datetime.utcnow()
+        )
+    assert len(spending) == BUDGET_COUNT
+    assert len(queries) == 1
+
+def test_listing_budgets_does_not_lazy_load_per_budget(db, engine, user_with_budgets):
+    service = BudgetService(db)
+    with count_queries(engine) as queries:
+        budgets = service.get_user_budgets(user_with_budgets)
+        # What the Budget response schema reads
+        for budget in budgets:
+            assert len(budget.expenses) == EXPENSES_PER_BUDGET
+            assert len(budget.alerts) == 1
+    # Budgets, then one IN query each for expenses and alerts
+    assert len(queries) <= 3
+
+def test_get_active_alerts_is_one_query(db, engine, user_with_budgets):
+    service = BudgetService(db)
+    with count_queries(engine) as queries:
+        alerts = service.get_active_alerts(user_with_budgets)
+        budget_ids = {alert.budget.id for alert in alerts}
+    assert len(budget_ids) == BUDGET_COUNT
+    assert len(queries) <= 1
+
+def test_get_budget_summary_query_bound(db, engine, user_with_budgets):
+    service = BudgetService(db)
+    budget_id = db.query(Budget.id).filter(Budget.user_id == user_with_budgets).first()[0]
+    with count_queries(engine) as queries:
+        summary = service.get_budget_summary(budget_id, user_with_budgets)
+    assert summary["total_spent"] == 10 * EXPENSES_PER_BUDGET
+    assert len(queries) <= 2
+
+def test_add_expense_query_bound(db, engine, user_with_budgets):
+    service = BudgetService(db)
+    budget_id = db.query(Budget.id).filter(Budget.user_id == user_with_budgets).first()[0]
+    # Below every alert threshold: update total, insert expense, reload it
+    with count_queries(engine) as queries:
+        service.add_expense(budget_id, BudgetExpenseCreate(amount=5, description=None))
+    assert len(queries) <= 3
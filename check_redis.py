@@ -1,18 +1,28 @@
 import redis
 
-try:
-    # Create a Redis client
-    r = redis.Redis(host='localhost', port=6379, db=0)
-    
-    # Try to ping the Redis server
-    response = r.ping()
-    if response:
-        print("[SUCCESS] Redis is running and accessible!")
-        print("Connection successful on localhost:6379")
-    else:
-        print("[ERROR] Redis is not responding properly")
-except redis.ConnectionError:
-    print("[ERROR] Could not connect to Redis")
-    print("Please make sure Redis is installed and running")
-except Exception as e:
-    print(f"[ERROR] An error occurred: {str(e)}")
+# One pooled client; importing this module reuses its connections instead of opening new ones
+pool = redis.ConnectionPool(host='localhost', port=6379, db=0, max_connections=32)
+r = redis.Redis(connection_pool=pool)
+
+def check_redis():
+    """PING and fetch server info in a single round-trip."""
+    pipe = r.pipeline(transaction=False)
+    pipe.ping()
+    pipe.info('server')
+    return pipe.execute()
+
+if __name__ == "__main__":
+    try:
+        # Try to ping the Redis server
+        response, info = check_redis()
+        if response:
+            print("[SUCCESS] Redis is running and accessible!")
+            print("Connection successful on localhost:6379")
+            print(f"Redis version: {info.get('redis_version', 'unknown')}")
+        else:
+            print("[ERROR] Redis is not responding properly")
+    except redis.ConnectionError:
+        print("[ERROR] Could not connect to Redis")
+        print("Please make sure Redis is installed and running")
+    except Exception as e:
+        print(f"[ERROR] An error occurred: {str(e)}")